@@ -135,24 +135,73 @@ function visitAllWorlds(data) {
   );
 }
 
+// State written for locations we add to the dlblob
+const DISCOVERED_STATE = 2;
+const LOCATION_SET = new Set(LOCATIONS);
+
+/**
+ * Parses a dlblob ("<location>:<state>:" repeated) into a Map of location -> state.
+ * Location names never contain ':', so a single split covers the whole blob.
+ * @param {string} blob - The gbx_discovery_pg.dlblob string
+ * @returns {Map<string, number>} Locations in blob order with their state digit
+ */
+function parseDlblob(blob) {
+  const entries = new Map();
+  const parts = (blob || '').split(':');
+  for (let i = 0; i + 1 < parts.length; i += 2) {
+    if (parts[i] && !entries.has(parts[i])) {
+      entries.set(parts[i], Number(parts[i + 1]));
+    }
+  }
+  return entries;
+}
+
+/**
+ * Serializes a Map of location -> state back into a dlblob string.
+ * @param {Map<string, number>} entries - Locations and their states
+ * @returns {string} The dlblob string
+ */
+function serializeDlblob(entries) {
+  let blob = '';
+  for (const [location, state] of entries) {
+    blob += `${location}:${state}:`;
+  }
+  return blob;
+}
+
 /**
  * Adds locations to the player's discovered locations list.
+ * Existing entries keep their state; added locations are marked discovered.
  * @param {Object} data - The parsed save file data
  * @param {string[]} locationSubstrings - Array of substrings to match against location names
  */
 function addDiscoveredLocations(data, locationSubstrings) {
   data.gbx_discovery_pg = data.gbx_discovery_pg || {};
-  let existingBlob = data.gbx_discovery_pg.dlblob || '';
-  let existing = existingBlob.split(/:\d:/).filter(Boolean);
+  const entries = parseDlblob(data.gbx_discovery_pg.dlblob);
 
-  let merged = new Set(existing);
-  for (const line of LOCATIONS) {
-    if (locationSubstrings.some((substr) => line.includes(substr))) {
-      merged.add(line);
+  const add = (location) => {
+    if (!(entries.get(location) >= DISCOVERED_STATE)) {
+      entries.set(location, DISCOVERED_STATE);
+    }
+  };
+  // Full location names are looked up directly; anything else is matched as a substring
+  const partial = [];
+  for (const substr of locationSubstrings) {
+    if (LOCATION_SET.has(substr)) {
+      add(substr);
+    } else {
+      partial.push(substr);
+    }
+  }
+  if (partial.length) {
+    for (const line of LOCATIONS) {
+      if (partial.some((substr) => line.includes(substr))) {
+        add(line);
+      }
     }
   }
 
-  data.gbx_discovery_pg.dlblob = Array.from(merged).join(':2:') + ':2:';
+  data.gbx_discovery_pg.dlblob = serializeDlblob(entries);
 }
 
 /**
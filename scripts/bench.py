@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# Benchmarks for the save tools on synthetic saves
+# Generates realistic saves (inventory/bank serials, fog maps, dlblob locations, missionsets from
+# data/missions.yaml), encrypts them like the game does and times every stage the scripts use:
+# AES, zlib, YAML parse/dump, the foddata codec, serial decoding and extract/merge.
+# Results are reported as MB/s (of each stage's input) and saves/s, and can be saved as JSON and
+# compared against an earlier run to spot regressions.
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+from Crypto.Util.Padding import pad
+
+# Benchmarks measure the real work, never cache hits
+os.environ['BL4_CACHE'] = '0'
+
+import blcrypt
+import datapack
+import dlcodec
+import extract_lists
+import extract_yaml
+import fogcodec
+import saveyaml
+import serials
+
+DEFAULT_USER_ID = '76561190000000001'
+FOG_LEVELNAMES = [
+    'Intro_P', 'World_P', 'Vault_Grasslands_P', 'Fortress_Grasslands_P',
+    'Vault_ShatteredLands_P', 'Fortress_Shatteredlands_P', 'Vault_Mountains_P',
+    'Fortress_Mountains_P', 'ElpisElevator_P', 'Elpis_P', 'UpperCity_P',
+]
+
+# Scale presets: backpack items, bank items, fog levels, dlblob locations, missionsets
+SIZES = {
+    'small': {'items': 40, 'bank': 0, 'fog_levels': 2, 'locations': 50, 'missionsets': 10},
+    'medium': {'items': 150, 'bank': 200, 'fog_levels': 11, 'locations': 400, 'missionsets': 60},
+    'large': {'items': 400, 'bank': 1000, 'fog_levels': 40, 'locations': 2000, 'missionsets': 200},
+}
+
+
+# Synthetic saves
+
+def random_serial(rng, level):
+    # Random item bits around a valid level field, so serial decoding has real work to do
+    head = serials.Bits(rng.getrandbits(40), 40)
+    n = rng.randrange(60, 200)
+    tail = serials.Bits(rng.getrandbits(n), n)
+    bits = head + serials.LEVEL_PREFIX + serials.encode_varint(level) + tail
+    return serials.bits_to_serial(bits)
+
+
+def fog_map(rng):
+    # Explored rectangles on a hidden map, with soft edges, roughly like real play
+    raw = bytearray(fogcodec.FOG_SIZE)
+    dim = fogcodec.FOG_DIM
+    for _ in range(rng.randrange(0, 30)):
+        x, y = rng.randrange(dim), rng.randrange(dim)
+        w, h = rng.randrange(4, 48), rng.randrange(4, 48)
+        for row in range(y, min(y + h, dim)):
+            start, end = row * dim + x, row * dim + min(x + w, dim)
+            raw[start:end] = b'\xff' * (end - start)
+            if end < (row + 1) * dim:
+                raw[end] = rng.randrange(1, 0xFF)
+    return bytes(raw)
+
+
+def dlblob(rng, count):
+    names = dlcodec.load_index().names
+    picked = rng.sample(names, min(count, len(names)))
+    picked += [f"DLMD_Synthetic_P_Object_UAID_{rng.getrandbits(72):018X}_{i}" for i in range(count - len(picked))]
+    return dlcodec.serialize((name, rng.randrange(1, 4)) for name in picked)
+
+
+def synthetic_save(rng, items=150, bank=200, fog_levels=11, locations=400, missionsets=60):
+    """A character save as a plain tree, with the sections the scripts read filled at the given scale."""
+    level = rng.randrange(1, serials.MAX_LEVEL + 1)
+
+    def slots(count, item_level):
+        return {f"slot_{i}": {'serial': random_serial(rng, item_level()), 'flags': rng.choice([0, 1, 3]),
+                              'state_flags': rng.choice([1, 3, 9])} for i in range(count)}
+
+    templates = datapack.load().tree('missions')
+    names = rng.sample(sorted(templates), min(missionsets, len(templates)))
+    local_sets = {name: copy.deepcopy(templates[name]) for name in names}
+    for i in range(missionsets - len(names)):
+        local_sets[f"missionset_synthetic_{i}"] = {'status': 'active', 'missions': {
+            f"mission_synthetic_{i}_{j}": {'status': 'active'} for j in range(rng.randrange(1, 6))}}
+
+    rewards = list(datapack.load().list('rewards'))
+    data = {
+        'state': {
+            'class': 'Char_DarkSiren',
+            'char_name': f"Bench{rng.randrange(1000)}",
+            'experience': [
+                {'type': 'Character', 'level': level, 'points': rng.randrange(10 ** 7)},
+                {'type': 'Specialization', 'level': rng.randrange(1, 701), 'points': rng.randrange(10 ** 9)},
+            ],
+            'currencies': {'cash': rng.randrange(10 ** 8), 'eridium': rng.randrange(10 ** 5)},
+            'ammo': {'pistol': 600, 'assaultrifle': 1080, 'shotgun': 120, 'smg': 960, 'sniper': 96},
+            'inventory': {
+                'items': {'backpack': slots(items, lambda: rng.randrange(1, level + 1))},
+                'equipped_inventory': {'equipped': slots(min(items, 8), lambda: level)},
+            },
+            'unique_rewards': rng.sample(rewards, min(len(rewards), rng.randrange(len(rewards) + 1))),
+        },
+        'domains': {'local': {'shared': {'inventory': {'items': {'bank': slots(bank, lambda: rng.randrange(1, 51))}}}}},
+        'stats': {'openworld': {'collectibles': copy.deepcopy(datapack.load().tree('collectibles'))}},
+        'gbx_discovery_pc': {
+            'foddatas': [{
+                'levelname': FOG_LEVELNAMES[i] if i < len(FOG_LEVELNAMES) else f"Synthetic_{i}_P",
+                'foddimensionx': fogcodec.FOG_DIM,
+                'foddimensiony': fogcodec.FOG_DIM,
+                'compressiontype': 'Zlib',
+                'foddata': fogcodec.encode(fog_map(rng)),
+            } for i in range(fog_levels)],
+        },
+        'gbx_discovery_pg': {'dlblob': dlblob(rng, locations)},
+        'missions': {'local_sets': local_sets},
+    }
+    return data
+
+
+def synthetic_yaml(rng, **scale):
+    return saveyaml.dump(synthetic_save(rng, **scale)).encode('utf-8')
+
+
+def generate(out_dir, count, seed=0, user_id=DEFAULT_USER_ID, level=blcrypt.DEFAULT_LEVEL, write_yaml=False, **scale):
+    """Write count encrypted saves to out_dir/<user_id>/<n>.sav (so the ID can be inferred). Returns the paths."""
+    rng = random.Random(seed)
+    save_dir = Path(out_dir) / user_id
+    save_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(1, count + 1):
+        yaml_bytes = synthetic_yaml(rng, **scale)
+        path = save_dir / f"{i}.sav"
+        path.write_bytes(blcrypt.encrypt_yaml_bytes(yaml_bytes, user_id, level))
+        if write_yaml:
+            path.with_suffix('.yaml').write_bytes(yaml_bytes)
+        paths.append(path)
+    return paths
+
+
+# Timing
+
+def best_time(func, items, repeat):
+    """Fastest of repeat runs of func over every item, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+STAGES = [
+    'aes-encrypt', 'aes-decrypt', 'zlib-compress', 'zlib-compress-fast', 'zlib-decompress', 'encrypt', 'decrypt',
+    'yaml-load', 'yaml-select', 'yaml-dump', 'fog-decode', 'fog-encode', 'serial-decode',
+    'extract-locations', 'extract-yaml', 'merge-missionsets',
+]
+
+
+def run_benchmarks(yaml_saves, user_id=DEFAULT_USER_ID, repeat=3, stages=None):
+    """
+    Time each stage over every save. Returns [{stage, seconds, bytes, saves, mb_s, saves_s}], where
+    bytes is the stage's total input size.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        # decrypt_sav_to_yaml reads from disk, so it gets real files
+        sav_paths = []
+        for i, yaml_bytes in enumerate(yaml_saves):
+            path = Path(tmp) / f"{i}.sav"
+            path.write_bytes(blcrypt.encrypt_yaml_bytes(yaml_bytes, user_id))
+            sav_paths.append(path)
+        return _run_stages(yaml_saves, sav_paths, user_id, repeat, stages)
+
+
+def _run_stages(yaml_saves, sav_paths, user_id, repeat, stages):
+    cipher = blcrypt.get_cipher(user_id)
+    compressed = [zlib.compress(y, blcrypt.DEFAULT_LEVEL) for y in yaml_saves]
+    padded = [pad(c + bytes(8), 16, style='pkcs7') for c in compressed]
+    encrypted = [path.read_bytes() for path in sav_paths]
+    trees = [saveyaml.load(y) for y in yaml_saves]
+    foddatas = [tree['gbx_discovery_pc']['foddatas'] for tree in trees]
+    fog_raw = [fogcodec.decode_levels(f, workers=1) for f in foddatas]
+    missionsets = [extract_yaml.extract_missionsets(tree) for tree in trees]
+
+    def merge(_):
+        merger = extract_yaml.YamlMerger()
+        for sets in missionsets:
+            merger.add(sets)
+        return merger.result()
+
+    def total(items):
+        return sum(map(len, items))
+
+    yaml_bytes = total(yaml_saves)
+    fog_bytes = sum(len(f['foddata']) for entries in foddatas for f in entries)
+    # (name, function, inputs, input bytes)
+    plan = [
+        ('aes-encrypt', cipher.encrypt, padded, total(padded)),
+        ('aes-decrypt', cipher.decrypt, encrypted, total(encrypted)),
+        ('zlib-compress', lambda y: zlib.compress(y, blcrypt.DEFAULT_LEVEL), yaml_saves, yaml_bytes),
+        ('zlib-compress-fast', lambda y: zlib.compress(y, blcrypt.FAST_LEVEL), yaml_saves, yaml_bytes),
+        ('zlib-decompress', zlib.decompress, compressed, total(compressed)),
+        ('encrypt', lambda y: blcrypt.encrypt_yaml_bytes(y, user_id), yaml_saves, yaml_bytes),
+        ('decrypt', lambda path: blcrypt.decrypt_sav_to_yaml(path, user_id), sav_paths, total(encrypted)),
+        ('yaml-load', saveyaml.load, yaml_saves, yaml_bytes),
+        ('yaml-select', lambda y: saveyaml.select_tree(y, extract_lists.LOCATIONS_PATHS), yaml_saves, yaml_bytes),
+        ('yaml-dump', saveyaml.dump, trees, yaml_bytes),
+        ('fog-decode', lambda f: fogcodec.decode_levels(f, workers=1), foddatas, fog_bytes),
+        ('fog-encode', lambda levels: fogcodec.encode_levels(levels, workers=1), fog_raw,
+         sum(len(raw) for levels in fog_raw for raw in levels.values())),
+        ('serial-decode', serials.decode_items, trees, None),
+        ('extract-locations', extract_lists.extract_locations_from_yaml, trees, None),
+        ('extract-yaml', extract_yaml.extract_outputs, trees, None),
+        ('merge-missionsets', merge, [None], None),
+    ]
+
+    results = []
+    for name, func, items, nbytes in plan:
+        if stages and name not in stages:
+            continue
+        seconds = best_time(func, items, repeat)
+        results.append({
+            'stage': name,
+            'seconds': seconds,
+            'bytes': nbytes,
+            'saves': len(yaml_saves),
+            'mb_s': nbytes / seconds / 1e6 if nbytes and seconds else None,
+            'saves_s': len(yaml_saves) / seconds if seconds else None,
+        })
+    return results
+
+
+def format_results(results, baseline=None):
+    baseline = {r['stage']: r for r in baseline or []}
+    lines = [f"{'stage':<20} {'ms':>10} {'MB/s':>10} {'saves/s':>10}" + ("  vs baseline" if baseline else "")]
+    for r in results:
+        mb_s = f"{r['mb_s']:.1f}" if r['mb_s'] else '-'
+        line = f"{r['stage']:<20} {r['seconds'] * 1000:>10.2f} {mb_s:>10} {r['saves_s']:>10.1f}"
+        old = baseline.get(r['stage'])
+        if old:
+            # Per save, so baselines taken with a different corpus size still compare
+            change = (r['seconds'] / r['saves']) / (old['seconds'] / old['saves']) - 1
+            line += f"  {change:+.1%}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load_corpus(inputs, user_id=None):
+    """YAML bytes for existing saves (.yaml or .sav), e.g. a directory written by generate."""
+    import corpus
+    saves = []
+    for path in corpus.expand_inputs(inputs):
+        if path.suffix == '.sav':
+            saves.append(blcrypt.decrypt_sav_to_yaml(path, user_id or blcrypt.infer_user_id(path)))
+        else:
+            saves.append(path.read_bytes())
+    return saves
+
+
+def add_scale_arguments(p):
+    p.add_argument('-s', '--size', choices=SIZES, default='medium', help='Scale preset (default: medium)')
+    p.add_argument('--items', type=int, help='Backpack items per save')
+    p.add_argument('--bank', type=int, help='Bank items per save')
+    p.add_argument('--fog-levels', type=int, help='foddatas levels per save')
+    p.add_argument('--locations', type=int, help='dlblob locations per save')
+    p.add_argument('--missionsets', type=int, help='Missionsets per save')
+    p.add_argument('-n', '--count', type=int, default=10, help='Number of saves (default: 10)')
+    p.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+
+def scale_from_args(args):
+    scale = dict(SIZES[args.size])
+    for key in scale:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    return scale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the save tools on synthetic saves")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_gen = sub.add_parser("generate", help="Write synthetic encrypted saves")
+    p_gen.add_argument('output', help='Output directory (saves go to <output>/<user id>/)')
+    add_scale_arguments(p_gen)
+    p_gen.add_argument('-id', '--userid', default=DEFAULT_USER_ID, help=f'Steam/Epic ID to encrypt with (default: {DEFAULT_USER_ID})')
+    p_gen.add_argument('--yaml', action='store_true', help='Also write the decrypted .yaml next to each .sav')
+    blcrypt.add_level_arguments(p_gen)
+
+    p_run = sub.add_parser("run", help="Time every stage and report throughput")
+    add_scale_arguments(p_run)
+    p_run.add_argument('-i', '--input', nargs='+', help='Benchmark existing saves/directories instead of generating')
+    p_run.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    p_run.add_argument('-r', '--repeat', type=int, default=3, help='Runs per stage, the fastest is reported (default: 3)')
+    p_run.add_argument('--stage', action='append', choices=STAGES, help='Only run this stage (repeatable)')
+    p_run.add_argument('--json', help='Write results to this JSON file')
+    p_run.add_argument('--baseline', help='Compare against results from an earlier --json run')
+
+    args = parser.parse_args()
+
+    if args.cmd == "generate":
+        paths = generate(args.output, args.count, args.seed, args.userid, args.level, args.yaml, **scale_from_args(args))
+        print(f"Wrote {len(paths)} saves to {paths[0].parent}")
+    elif args.cmd == "run":
+        if args.input:
+            saves = load_corpus(args.input, args.userid)
+            if not saves:
+                print("Error: no saves found", file=sys.stderr)
+                sys.exit(1)
+        else:
+            rng = random.Random(args.seed)
+            scale = scale_from_args(args)
+            saves = [synthetic_yaml(rng, **scale) for _ in range(args.count)]
+        print(f"{len(saves)} saves, {sum(map(len, saves)) / 1e6:.2f} MB of YAML", file=sys.stderr)
+        results = run_benchmarks(saves, args.userid or DEFAULT_USER_ID, args.repeat, args.stage)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)['results']
+        print(format_results(results, baseline))
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({'saves': len(saves), 'bytes': sum(map(len, saves)), 'results': results}, f, indent=2)
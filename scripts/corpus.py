@@ -0,0 +1,134 @@
+# Load many Borderlands 4 saves (.yaml, or .sav decrypted in memory) for the extract scripts
+# Work is fanned out over a process pool and results come back to the parent in input order.
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import profiling
+import savecache
+import saveyaml
+
+SAVE_SUFFIXES = ('.yaml', '.sav')
+
+
+def expand_inputs(inputs, suffixes=SAVE_SUFFIXES):
+    """
+    Files are kept as given; directories are scanned recursively for saves. Where a directory holds
+    the same save twice (N.sav next to its decrypted N.yaml, as blcrypt batch leaves them), only
+    the .sav is kept.
+    """
+    files = []
+    for path in map(Path, inputs):
+        if path.is_dir():
+            found = {}
+            for p in sorted(path.rglob('*')):
+                if p.suffix in suffixes and (p.suffix == '.sav' or p.with_suffix('') not in found):
+                    found[p.with_suffix('')] = p
+            files.extend(sorted(found.values()))
+        else:
+            files.append(path)
+    return files
+
+
+def output_jobs(inputs, output_dir=None):
+    """(input, output) pairs; outputs mirror each input directory under output_dir, or overwrite inputs."""
+    jobs = []
+    for path in map(Path, inputs):
+        if path.is_dir():
+            files = [(p, p.relative_to(path)) for p in sorted(path.rglob('*')) if p.suffix in SAVE_SUFFIXES]
+        else:
+            files = [(path, Path(path.name))]
+        for in_path, rel in files:
+            jobs.append((in_path, Path(output_dir) / rel if output_dir else in_path))
+    return jobs
+
+
+def write_output(path, data, newline=None):
+    """
+    Write bytes or text (UTF-8, newline as for open()) to path through a sibling temp file, so an
+    interrupted run never leaves a truncated save behind, even with --inplace.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        if isinstance(data, bytes):
+            tmp.write_bytes(data)
+        else:
+            with open(tmp, 'w', encoding='utf-8', newline=newline) as f:
+                f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def load_save(path, paths=None, user_id=None):
+    """
+    Load a save, or only the given dotted paths of it. .sav files are decrypted without touching disk.
+    Parsed results are cached by file content (see savecache), so unchanged saves load from a pickle.
+    """
+    path = Path(path)
+    with profiling.stage('load', path, bytes_in=path.stat().st_size):
+        return _load_save(path, paths, user_id)
+
+
+def _load_save(path, paths, user_id):
+    if path.suffix == '.sav':
+        # Imported here so YAML-only runs don't need pycryptodome
+        import blcrypt
+        user_id = user_id or blcrypt.infer_user_id(path)
+        if not user_id:
+            raise ValueError("no user ID in path, pass -id")
+    else:
+        user_id = None
+    # One pass over the file: for .sav this is also the key of the decrypted YAML entry
+    content_key = savecache.file_key(path, user_id) if savecache.enabled() else None
+    cache_key = savecache.key(content_key.encode(), sorted(paths) if paths else None) if content_key else None
+    if cache_key:
+        with profiling.stage('cache-get'):
+            tree = savecache.get_tree(cache_key)
+        if tree is not None:
+            return tree
+    if path.suffix == '.sav':
+        yaml_bytes = blcrypt.decrypt_sav_to_yaml(path, user_id, key=content_key)
+        tree = saveyaml.select_tree(yaml_bytes, paths) if paths else saveyaml.load(yaml_bytes)
+    else:
+        tree = saveyaml.load_paths(path, paths) if paths else saveyaml.load_file(path)
+    if cache_key:
+        savecache.put_tree(cache_key, tree)
+    return tree
+
+
+def _run(func, paths, user_id, path):
+    try:
+        data = load_save(path, paths, user_id)
+        with profiling.stage('process', path):
+            return func(data), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def map_saves(func, inputs, paths=None, user_id=None, workers=None):
+    """
+    Yield (path, func(data)) for every save. func must be a module-level function so it can be
+    sent to worker processes. Saves that fail to load are reported and skipped.
+    """
+    files = expand_inputs(inputs)
+    job = partial(_run, func, paths, user_id)
+    if len(files) <= 1 or workers == 1:
+        results = map(job, files)
+        yield from _report(files, results)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _report(files, pool.map(job, files))
+
+
+def _report(files, results):
+    for path, (result, error) in zip(files, results):
+        if error:
+            print(f"Warning: skipping {path}: {error}", file=sys.stderr)
+            continue
+        yield path, result
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# Compiled pack of the data/ reference tables
+# Every .txt list, .csv table and .yaml template in data/ goes into one memory-mapped file with
+# a shared (interned) string table, so lookups only touch the pages they need instead of parsing
+# CSV/YAML on every run. The pack is rebuilt automatically when a source file changes.
+#
+# Layout (little-endian uint32 unless noted):
+#   header     magic 'BL4DPACK', version, table count, strings offset, 32-byte source fingerprint
+#   directory  per table: name string id, kind, offset, length
+#   strings    count, count+1 offsets into the UTF-8 blob, blob
+#   LIST       count, string ids in file order, string ids sorted by value
+#   TABLE      rows, columns, header ids, row-major cell ids, row numbers sorted by first column
+#   TREE       pickled YAML document (loaded on first access)
+
+import argparse
+import csv
+import hashlib
+import os
+import pickle
+import struct
+import sys
+from bisect import bisect_left
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
+
+import saveyaml
+
+DATA_DIR = Path(__file__).parent / '../data'
+DEFAULT_PACK = DATA_DIR / 'datapack.bin'
+
+MAGIC = b'BL4DPACK'
+VERSION = 1
+HEADER = struct.Struct('<8sIII32s')
+DIR_ENTRY = struct.Struct('<IIII')
+KIND_LIST, KIND_TABLE, KIND_TREE = 1, 2, 3
+KIND_NAMES = {KIND_LIST: 'list', KIND_TABLE: 'table', KIND_TREE: 'tree'}
+
+# Derived copies of the .txt/.yaml files, only needed by the web UI
+SKIP_SUFFIX = '_compressed'
+
+
+def sources(data_dir=DATA_DIR):
+    """{table name: (path, kind)} for every reference file in data_dir."""
+    kinds = {'.txt': KIND_LIST, '.csv': KIND_TABLE, '.yaml': KIND_TREE}
+    found = {}
+    for path in sorted(Path(data_dir).iterdir()):
+        if path.suffix in kinds and not path.stem.endswith(SKIP_SUFFIX):
+            found[path.stem] = (path, kinds[path.suffix])
+    return found
+
+
+def fingerprint(data_dir=DATA_DIR):
+    # Size and mtime are enough to notice edits without reading the files
+    h = hashlib.sha256(str(VERSION).encode())
+    for name, (path, kind) in sources(data_dir).items():
+        st = path.stat()
+        h.update(f"{name}\0{kind}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+    return h.digest()
+
+
+def _u32(values):
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+
+    def intern(self, s):
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = self.ids[s] = len(self.ids)
+        return sid
+
+    def encode(self):
+        blobs = [s.encode('utf-8') for s in self.ids]
+        offsets = [0]
+        for b in blobs:
+            offsets.append(offsets[-1] + len(b))
+        return _u32([len(blobs)]) + _u32(offsets) + b''.join(blobs)
+
+
+def _encode_list(strings, items):
+    ids = [strings.intern(s) for s in items]
+    order = sorted(range(len(items)), key=items.__getitem__)
+    return _u32([len(ids)]) + _u32(ids) + _u32([ids[i] for i in order])
+
+
+def _encode_table(strings, rows):
+    header, body = rows[0], rows[1:]
+    ncols = len(header)
+    body = [(row + [''] * ncols)[:ncols] for row in body]
+    cells = [strings.intern(cell) for row in body for cell in row]
+    order = sorted(range(len(body)), key=lambda i: body[i][0])
+    return (_u32([len(body), ncols]) + _u32([strings.intern(h) for h in header])
+            + _u32(cells) + _u32(order))
+
+
+def build(out_path=DEFAULT_PACK, data_dir=DATA_DIR):
+    """Compile every reference file in data_dir into out_path."""
+    strings = _Strings()
+    tables = []
+    for name, (path, kind) in sources(data_dir).items():
+        if kind == KIND_LIST:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = _encode_list(strings, [line.strip() for line in f if line.strip()])
+        elif kind == KIND_TABLE:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                payload = _encode_table(strings, [row for row in csv.reader(f) if row])
+        else:
+            payload = pickle.dumps(saveyaml.untag(saveyaml.load_file(path)), protocol=pickle.HIGHEST_PROTOCOL)
+        tables.append((strings.intern(name), kind, payload))
+
+    string_blob = strings.encode()
+    offset = HEADER.size + DIR_ENTRY.size * len(tables)
+    strings_offset = offset
+    offset += len(string_blob)
+    directory, sections = [], []
+    for name_id, kind, payload in tables:
+        pad = -offset % 4
+        sections.append(b'\0' * pad + payload)
+        offset += pad
+        directory.append(DIR_ENTRY.pack(name_id, kind, offset, len(payload)))
+        offset += len(payload)
+
+    out_path = Path(out_path)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tables), strings_offset, fingerprint(data_dir)))
+        f.writelines(directory)
+        f.write(string_blob)
+        f.writelines(sections)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+class StringList:
+    """Read-only sequence of strings with O(log n) membership tests."""
+
+    def __init__(self, pack, offset):
+        self.pack = pack
+        self.count = pack.u32(offset, 1)[0]
+        self.ids = pack.u32(offset + 4, self.count)
+        self.sorted_ids = pack.u32(offset + 4 + 4 * self.count, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.pack.string(self.ids[i])
+
+    def __iter__(self):
+        return map(self.pack.string, self.ids)
+
+    def __contains__(self, value):
+        keys = _Keys(self.count, lambda i: self.pack.string(self.sorted_ids[i]))
+        i = bisect_left(keys, value)
+        return i < self.count and keys[i] == value
+
+
+class Table:
+    """CSV table; rows come back as dicts of strings, like csv.DictReader."""
+
+    def __init__(self, pack, offset):
+        self.pack = pack
+        self.nrows, self.ncols = pack.u32(offset, 2)
+        self.columns = [pack.string(sid) for sid in pack.u32(offset + 8, self.ncols)]
+        self.cells = pack.u32(offset + 8 + 4 * self.ncols, self.nrows * self.ncols)
+        self.order = pack.u32(offset + 8 + 4 * self.ncols + 4 * self.nrows * self.ncols, self.nrows)
+
+    def __len__(self):
+        return self.nrows
+
+    def row(self, i):
+        start = i * self.ncols
+        return dict(zip(self.columns, map(self.pack.string, self.cells[start:start + self.ncols])))
+
+    def __iter__(self):
+        return map(self.row, range(self.nrows))
+
+    def lookup(self, value, column=None):
+        """Rows whose column (default: the first) equals value. First-column lookups use the sorted index."""
+        if column is not None and column != self.columns[0]:
+            col = self.columns.index(column)
+            return [self.row(i) for i in range(self.nrows)
+                    if self.pack.string(self.cells[i * self.ncols + col]) == value]
+        keys = _Keys(self.nrows, lambda i: self.pack.string(self.cells[self.order[i] * self.ncols]))
+        rows = []
+        i = bisect_left(keys, value)
+        while i < self.nrows and keys[i] == value:
+            rows.append(self.row(self.order[i]))
+            i += 1
+        return rows
+
+
+class _Keys:
+    # Sorted keys decoded on demand, so bisect only reads the strings it compares
+    def __init__(self, count, key):
+        self.count = count
+        self.key = key
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.key(i)
+
+
+class DataPack:
+    def __init__(self, path=DEFAULT_PACK):
+        if sys.byteorder != 'little':
+            raise RuntimeError("data packs can only be read on little-endian machines")
+        with open(path, 'rb') as f:
+            self.mm = mmap(f.fileno(), 0, access=ACCESS_READ)
+        try:
+            magic, version, ntables, strings_offset, self.fingerprint = HEADER.unpack_from(self.mm, 0)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} data pack")
+        self.view = memoryview(self.mm)
+        self.string_count = self.u32(strings_offset, 1)[0]
+        self.string_offsets = self.u32(strings_offset + 4, self.string_count + 1)
+        self.string_base = strings_offset + 4 + 4 * (self.string_count + 1)
+        self._strings = {}
+        self.directory = {}
+        for i in range(ntables):
+            name_id, kind, offset, length = DIR_ENTRY.unpack_from(self.mm, HEADER.size + i * DIR_ENTRY.size)
+            self.directory[self.string(name_id)] = (kind, offset, length)
+        self._tables = {}
+
+    def close(self):
+        """Unmap the pack (Windows can't replace a mapped file). Lists and tables from it become unusable."""
+        for table in self._tables.values():
+            for attr in ('ids', 'sorted_ids', 'cells', 'order'):
+                view = getattr(table, attr, None)
+                if isinstance(view, memoryview):
+                    view.release()
+        self.string_offsets.release()
+        self.view.release()
+        self.mm.close()
+
+    def u32(self, offset, count):
+        return self.view[offset:offset + 4 * count].cast('I')
+
+    def string(self, sid):
+        s = self._strings.get(sid)
+        if s is None:
+            start = self.string_base + self.string_offsets[sid]
+            end = self.string_base + self.string_offsets[sid + 1]
+            s = self._strings[sid] = str(self.view[start:end], 'utf-8')
+        return s
+
+    def _get(self, name, kind):
+        entry = self.directory.get(name)
+        if entry is None or entry[0] != kind:
+            raise KeyError(f"no {KIND_NAMES[kind]} named {name!r} in data pack")
+        if name not in self._tables:
+            _, offset, length = entry
+            if kind == KIND_LIST:
+                self._tables[name] = StringList(self, offset)
+            elif kind == KIND_TABLE:
+                self._tables[name] = Table(self, offset)
+            else:
+                self._tables[name] = pickle.loads(self.view[offset:offset + length])
+        return self._tables[name]
+
+    def list(self, name):
+        return self._get(name, KIND_LIST)
+
+    def table(self, name):
+        return self._get(name, KIND_TABLE)
+
+    def tree(self, name):
+        """Parsed YAML template. Shared between callers, so copy before modifying."""
+        return self._get(name, KIND_TREE)
+
+
+_packs = {}
+
+
+def load(path=DEFAULT_PACK, data_dir=DATA_DIR):
+    """Open the pack (once per process), rebuilding it first if data/ changed since it was built."""
+    path = Path(path)
+    pack = _packs.get(path)
+    if pack is None:
+        expected = fingerprint(data_dir)
+        try:
+            pack = DataPack(path)
+        except (OSError, ValueError):
+            pack = None
+        if pack is None or pack.fingerprint != expected:
+            if pack is not None:
+                pack.close()  # release the mapping before build() replaces the file
+            build(path, data_dir)
+            pack = DataPack(path)
+        pack = _packs[path] = pack
+    return pack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile data/ reference tables into a fast-loading pack and query it")
+    parser.add_argument('-p', '--pack', default=DEFAULT_PACK, help='Pack file (default: data/datapack.bin)')
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("build", help="(Re)build the pack from data/")
+    sub.add_parser("info", help="List the tables in the pack")
+    p_has = sub.add_parser("contains", help="Check whether a list contains a value")
+    p_has.add_argument('name', help='List name, e.g. locations')
+    p_has.add_argument('value')
+    p_lookup = sub.add_parser("lookup", help="Print table rows matching a value")
+    p_lookup.add_argument('name', help='Table name, e.g. black_market')
+    p_lookup.add_argument('value')
+    p_lookup.add_argument('-c', '--column', help='Column to match (default: the first)')
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        print(f"Data pack written to {build(args.pack)}")
+    else:
+        pack = load(args.pack)
+        if args.cmd == "info":
+            for name, (kind, _, length) in pack.directory.items():
+                print(f"{name}: {KIND_NAMES[kind]}, {length} bytes")
+        elif args.cmd == "contains":
+            found = args.value in pack.list(args.name)
+            print("yes" if found else "no")
+            sys.exit(0 if found else 1)
+        elif args.cmd == "lookup":
+            for row in pack.table(args.name).lookup(args.value, args.column):
+                print(row)
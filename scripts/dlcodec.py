@@ -0,0 +1,131 @@
+# Discovered locations (gbx_discovery_pg.dlblob) codec and location index for Borderlands 4 saves
+# The blob is a run of `<location>:<state>:` entries, e.g. `DLMD_World_P_..._1298388568:2:`, where
+# state is a single digit (the web editor writes 2 for locations it adds). Location names never
+# contain ':', so one str.split gives every (location, state) pair without a regex. Readers that
+# only want names use parse(blob, strict=False), which splits on `:<digit>:` like the old tools did
+# and keeps whatever it can from damaged blobs.
+# LocationIndex answers name, prefix and UAID lookups over data/locations.txt with hashes and
+# bisection instead of substring scans of the whole list.
+
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+import datapack
+
+DISCOVERED = 2
+UAID_MARKER = '_UAID_'
+STATE_RE = re.compile(r':(\d):')
+
+
+def parse(blob, strict=True):
+    """
+    [(location, state)] in blob order. Raises ValueError for entries without a single-digit state,
+    unless strict is False: then text between `:<digit>:` separators is taken as the location and a
+    trailing piece without a state comes back with state None.
+    """
+    if not blob:
+        return []
+    if not strict:
+        parts = STATE_RE.split(blob)
+        pairs = [(location, int(state)) for location, state in zip(parts[0:-1:2], parts[1::2]) if location]
+        if parts[-1]:
+            pairs.append((parts[-1], None))
+        return pairs
+    parts = blob.split(':')
+    if parts[-1]:
+        raise ValueError(f"dlblob does not end with a state: ...{blob[-40:]!r}")
+    parts.pop()
+    if len(parts) % 2:
+        raise ValueError("dlblob has a location without a state")
+    pairs = []
+    for location, state in zip(parts[0::2], parts[1::2]):
+        if len(state) != 1 or not state.isdigit():
+            raise ValueError(f"invalid dlblob state {state!r} for {location!r}")
+        if location:
+            pairs.append((location, int(state)))
+    return pairs
+
+
+def to_dict(blob):
+    """{location: state}, keeping the first occurrence of repeated locations."""
+    entries = {}
+    for location, state in parse(blob):
+        entries.setdefault(location, state)
+    return entries
+
+
+def serialize(entries):
+    """Blob for (location, state) pairs or a {location: state} mapping."""
+    if isinstance(entries, dict):
+        entries = entries.items()
+    return ''.join(f"{location}:{state}:" for location, state in entries)
+
+
+def add(blob, locations, state=DISCOVERED):
+    """Blob with locations added (or raised to state), other entries and their states kept."""
+    entries = to_dict(blob)
+    for location in locations:
+        if entries.get(location, -1) < state:
+            entries[location] = state
+    return serialize(entries)
+
+
+def uaid(location):
+    """The `<actor id>_<number>` part after _UAID_, or None."""
+    _, marker, suffix = location.partition(UAID_MARKER)
+    return suffix if marker else None
+
+
+class LocationIndex:
+    """Known locations with O(1) name/UAID lookups and O(log n) prefix ranges."""
+
+    def __init__(self, names, activities=None):
+        self.names = list(dict.fromkeys(names))
+        self.known = set(self.names)
+        self.sorted = sorted(self.names)
+        self.by_uaid = {}
+        for name in self.names:
+            self.by_uaid.setdefault(uaid(name), name)
+        # poi_id -> activity name (locations_activities.csv), and the reverse
+        self.activities = dict(activities or {})
+        self.by_activity = {}
+        for poi_id, activity in self.activities.items():
+            self.by_activity.setdefault(activity, []).append(poi_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, location):
+        return location in self.known
+
+    def with_prefix(self, prefix):
+        """Known locations starting with prefix, in sorted order."""
+        i = bisect_left(self.sorted, prefix)
+        out = []
+        while i < len(self.sorted) and self.sorted[i].startswith(prefix):
+            out.append(self.sorted[i])
+            i += 1
+        return out
+
+    def lookup_uaid(self, suffix):
+        return self.by_uaid.get(suffix)
+
+    def search(self, substring):
+        """Known locations containing substring, in file order. A linear scan, for free-form queries."""
+        return [name for name in self.names if substring in name]
+
+    def unknown(self, locations):
+        """Locations that are not in the index (e.g. to grow locations.txt)."""
+        return [location for location in locations if location not in self.known]
+
+
+@lru_cache(maxsize=None)
+def load_index():
+    """LocationIndex over data/locations.txt and locations_activities.csv, built once per process."""
+    pack = datapack.load()
+    activities = {row['poi_id']: row['name'] for row in pack.table('locations_activities')}
+    return LocationIndex(pack.list('locations'), activities)
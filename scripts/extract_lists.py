@@ -1,65 +1,65 @@
 #!/usr/bin/env python3
-# Extract locations/rewards from a Borderlands 4 YAML save file
+# Extract locations/rewards from Borderlands 4 save files (YAML or .sav)
 # Produces a human-readable list and a compressed, base64-encoded string for usage in JavaScript
 
 
 import argparse
+import heapq
 import os
-import yaml
-import re
 import zlib
 import base64
 
-
-def unknown_tag(loader, tag_suffix, node):
-    if isinstance(node, yaml.SequenceNode):
-        return loader.construct_sequence(node)
-    elif isinstance(node, yaml.MappingNode):
-        return loader.construct_mapping(node)
-    else:
-        return loader.construct_scalar(node)
-
-yaml.SafeLoader.add_multi_constructor('!', unknown_tag)
+import corpus
+import dlcodec
+import profiling
 
 
-def extract_and_merge(input_yaml, output_text, compressed_output, extract_func):
-    with open(input_yaml, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
+def read_entries(path):
+    # The txt file is kept sorted, so it doubles as the index we merge against
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = [line.strip() for line in f if line.strip()]
+    if any(a >= b for a, b in zip(entries, entries[1:])):
+        entries = sorted(set(entries))
+    return entries
 
-    # Extract new entries using the provided function
-    new_entries = set(extract_func(data))
 
-    # Read existing entries from output file, if it exists
-    existing_entries = set()
-    if os.path.exists(output_text):
-        with open(output_text, 'r', encoding='utf-8') as out:
-            for line in out:
-                line = line.strip()
-                if line:
-                    existing_entries.add(line)
+def extract_and_merge(inputs, output_text, compressed_output, extract_func, paths=None, user_id=None, workers=None):
+    if isinstance(inputs, (str, os.PathLike)):
+        inputs = [inputs]
 
-    # Merge and deduplicate
-    initial_count = len(existing_entries)
-    all_entries = existing_entries | new_entries
-    added_count = len(all_entries) - initial_count
+    # Extract new entries from every input (YAML or .sav, files or directories) using the provided function.
+    # Only the parts of each save the extractor needs are parsed, if we know them.
+    new_entries = set()
+    for input_path, entries in corpus.map_saves(extract_func, inputs, paths, user_id, workers):
+        new_entries.update(entries)
+        print(f"Extracted {len(entries)} entries from {input_path}.")
 
-    # Sort for consistency
-    all_entries = sorted(all_entries)
+    # Dedup against the existing list, then merge the (sorted) additions in one linear pass
+    with profiling.stage('read', output_text):
+        existing_entries = read_entries(output_text)
+    added = sorted(new_entries.difference(existing_entries))
+    added_count = len(added)
 
-    print(f"Extracted {len(new_entries)} entries from YAML.")
     if added_count == 0:
         print("No new entries to add. Exiting.")
         return
     print(f"Adding {added_count} new entries.")
+    with profiling.stage('merge'):
+        all_entries = list(heapq.merge(existing_entries, added))
 
     # Write merged entries to txt file (one per line)
-    with open(output_text, 'w', encoding='utf-8') as out:
-        for entry in all_entries:
-            out.write(entry + '\n')
+    with profiling.stage('write', output_text):
+        with open(output_text, 'w', encoding='utf-8') as out:
+            for entry in all_entries:
+                out.write(entry + '\n')
 
     # Join, compress, and encode for JS
-    joined = ','.join(all_entries)
-    compressed = zlib.compress(joined.encode('utf-8'))
+    joined = ','.join(all_entries).encode('utf-8')
+    with profiling.stage('zlib-compress', bytes_in=len(joined)) as st:
+        compressed = zlib.compress(joined)
+        st.bytes_out = len(compressed)
     b64 = base64.b64encode(compressed).decode('ascii')
 
     if not compressed_output:
@@ -71,10 +71,12 @@ def extract_and_merge(input_yaml, output_text, compressed_output, extract_func):
     print(f"Compressed string written to {compressed_output}")
 
 
+LOCATIONS_PATHS = ['gbx_discovery_pg.dlblob']
+REWARDS_PATHS = ['state.unique_rewards']
+
+
 def extract_locations_from_yaml(data):
-    dlblob = data['gbx_discovery_pg']['dlblob']
-    locations = re.split(r':\d:', dlblob)
-    return [loc for loc in locations if loc]
+    return [location for location, _ in dlcodec.parse(data['gbx_discovery_pg']['dlblob'], strict=False)]
 
 
 def extract_rewards_from_yaml(data):
@@ -82,24 +84,34 @@ def extract_rewards_from_yaml(data):
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Extract discovered locations or unique rewards from a YAML save file, then export as raw and compressed files")
-    parser.add_argument('-i', '--inputyaml', help='Input YAML file', required=True)
+    parser = argparse.ArgumentParser(description="Extract discovered locations or unique rewards from save files, then export as raw and compressed files")
+    parser.add_argument('-i', '--inputyaml', nargs='+', help='Input YAML/.sav file(s) or directories. All are merged in one pass.', required=True)
     parser.add_argument('-o', '--outputtext', help='Output entries to txt file. Will merge with existing.', required=True)
     parser.add_argument('-c', '--compressed', help='Output compressed base64 txt file', required=False)
     parser.add_argument('-r', '--rewards', action='store_true', help='Extract unique rewards instead of locations')
+    parser.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    parser.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    profiling.start(args)
 
     if args.rewards:
         extract_and_merge(
             args.inputyaml,
             args.outputtext,
             args.compressed,
-            extract_rewards_from_yaml
+            extract_rewards_from_yaml,
+            REWARDS_PATHS,
+            args.userid,
+            args.jobs
         )
     else:
         extract_and_merge(
             args.inputyaml,
             args.outputtext,
             args.compressed,
-            extract_locations_from_yaml
+            extract_locations_from_yaml,
+            LOCATIONS_PATHS,
+            args.userid,
+            args.jobs
         )
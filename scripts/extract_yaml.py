@@ -1,8 +1,7 @@
 #!/usr/bin/env python3
-# Extract missionsets and/or collectibles from a Borderlands 4 YAML save file
+# Extract missionsets and/or collectibles from Borderlands 4 save files (YAML or .sav)
 # Produce compressed, base64-encoded strings for usage in JavaScript
 
-import yaml
 import argparse
 import zlib
 import base64
@@ -10,15 +9,13 @@ import sys
 import os
 from pathlib import Path
 
-def unknown_tag(loader, tag_suffix, node):
-    if isinstance(node, yaml.SequenceNode):
-        return loader.construct_sequence(node)
-    elif isinstance(node, yaml.MappingNode):
-        return loader.construct_mapping(node)
-    else:
-        return loader.construct_scalar(node)
+import corpus
+import profiling
+import saveyaml
 
-yaml.SafeLoader.add_multi_constructor('!', unknown_tag)
+MISSIONSETS_PATH = 'missions.local_sets'
+COLLECTIBLES_PATH = 'stats.openworld.collectibles'
+UNLOCKABLES_PATH = 'domains.local.unlockables'
 
 def extract_missionsets(data):
     local_sets = data.get('missions', {}).get('local_sets', {})
@@ -38,99 +35,199 @@ def extract_collectibles(data):
 def extract_global_unlockables(data):
     return data.get('domains', {}).get('local', {}).get('unlockables', {})
 
+def extract_outputs(data):
+    # One worker call per save; sections that weren't selected come back empty
+    return (
+        extract_missionsets(data),
+        sort_dict(extract_collectibles(data)),
+        sort_dict(extract_global_unlockables(data)),
+    )
+
 def sort_dict(obj):
     if isinstance(obj, dict):
         # Sort keys case-insensitively
-        return {k: sort_dict(obj[k]) for k in sorted(obj, key=lambda x: x.lower())}
+        return {k: sort_dict(obj[k]) for k in sorted(obj, key=str.lower)}
     elif isinstance(obj, list):
+        items = [sort_dict(x) for x in obj]
+        if all(isinstance(x, str) for x in items):
+            return sorted(items, key=str.lower)
         try:
-            return sorted((sort_dict(x) for x in obj), key=lambda x: str(x).lower())
+            return sorted(items, key=lambda x: str(x).lower())
         except TypeError:
-            return [sort_dict(x) for x in obj]
+            return items
     else:
         return obj
 
-def merge_yaml(existing, new):
+class OrderedSet:
+    """Insertion-ordered set for merged lists; falls back to a list for unhashable items."""
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = {}
+        self.update(items)
+
+    def update(self, items):
+        if isinstance(self.items, dict):
+            try:
+                for x in items:
+                    self.items[x] = None
+                return
+            except TypeError:
+                self.items = list(self.items)
+        for x in items:
+            if x not in self.items:
+                self.items.append(x)
+
+def copy_tree(obj):
+    if isinstance(obj, dict):
+        return {k: copy_tree(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [copy_tree(x) for x in obj]
+    return obj
+
+class YamlMerger:
     """
-    Recursively merge new into existing:
+    Accumulate merge_yaml() over any number of trees without re-sorting on every step:
     - Add new keys/values.
     - If value is a dict, recurse.
-    - If value is a list, add new items (no duplicates) and sort.
+    - If value is a list, add new items (no duplicates); sorted once in result().
     - If value is a scalar, update only if not a dict/list.
+    Dict levels that take part in a merge get their keys sorted case-insensitively in result().
+    Inputs are copied, never modified.
     """
-    for key, new_val in new.items():
-        if key in existing:
-            old_val = existing[key]
-            if isinstance(old_val, dict) and isinstance(new_val, dict):
-                merge_yaml(old_val, new_val)
-            elif isinstance(old_val, list) and isinstance(new_val, list):
-                # Merge, deduplicate, and sort
-                merged = list(set(old_val) | set(new_val))
-                # If all elements are strings, sort as strings
-                if all(isinstance(x, str) for x in merged):
-                    merged.sort(key=lambda x: x.lower())
-                else:
+
+    def __init__(self):
+        self.root = {}
+        self.count = 0
+        self.sorted_ids = set()
+
+    def add(self, new):
+        if self.count:
+            self.sorted_ids.add(id(self.root))
+        with profiling.stage('merge'):
+            self._merge(self.root, new)
+        self.count += 1
+        return self
+
+    def _merge(self, existing, new):
+        for key, new_val in new.items():
+            if key in existing:
+                old_val = existing[key]
+                if isinstance(old_val, dict) and isinstance(new_val, dict):
+                    self._merge(old_val, new_val)
+                    self.sorted_ids.add(id(old_val))
+                elif isinstance(old_val, (list, OrderedSet)) and isinstance(new_val, list):
+                    if isinstance(old_val, list):
+                        old_val = existing[key] = OrderedSet(old_val)
+                    old_val.update(new_val)
+                elif not isinstance(old_val, (dict, list, OrderedSet)):
+                    # Only update if not an object/array
+                    existing[key] = copy_tree(new_val)
+                # else: do not update if types are incompatible
+            else:
+                existing[key] = copy_tree(new_val)
+
+    def result(self):
+        """The merged tree as plain dicts/lists/strings (tags dropped), sorted where merged."""
+        return self._emit(self.root)
+
+    def _emit(self, obj):
+        if isinstance(obj, dict):
+            keys = sorted(obj, key=str.lower) if id(obj) in self.sorted_ids else obj
+            return {k: self._emit(obj[k]) for k in keys}
+        elif isinstance(obj, OrderedSet):
+            merged = [self._emit(x) for x in obj.items]
+            # If all elements are strings, sort as strings
+            if all(isinstance(x, str) for x in merged):
+                merged.sort(key=str.lower)
+            else:
+                try:
                     merged.sort()
-                existing[key] = merged
-            elif not isinstance(old_val, (dict, list)):
-                # Only update if not an object/array
-                existing[key] = new_val
-            # else: do not update if types are incompatible
-        else:
-            # Add new key
-            existing[key] = new_val
-    # Sort keys at this level
-    if isinstance(existing, dict):
-        sorted_items = sorted(existing.items(), key=lambda x: x[0].lower())
-        existing.clear()
-        existing.update(sorted_items)
-    return existing
-
-def write_yaml_and_compressed(obj, output_yaml, compressed):
-    # If existing_yaml is provided, load and merge
+                except TypeError:
+                    pass
+            return merged
+        elif isinstance(obj, list):
+            return [self._emit(x) for x in obj]
+        elif isinstance(obj, str):
+            return str(obj)
+        return obj
+
+def merge_yaml(existing, new):
+    """Merge new into existing (see YamlMerger) and return the result. Neither input is modified."""
+    return YamlMerger().add(existing).add(new).result()
+
+def output_merger(output_yaml):
+    # Extracted objects are merged on top of the existing output, if any
+    merger = YamlMerger()
     if output_yaml and os.path.exists(output_yaml):
-        with open(output_yaml, 'r', encoding='utf-8') as f:
-            existing = yaml.safe_load(f) or {}
-        obj = merge_yaml(existing, obj)
-    with open(output_yaml, 'w', encoding='utf-8') as f:
-        yaml.safe_dump(obj, f, allow_unicode=True, sort_keys=False)
+        merger.add(saveyaml.load_file(output_yaml) or {})
+    return merger
+
+def write_yaml_and_compressed(merger, output_yaml, compressed):
+    # result() drops the game's tags, which js-yaml in the browser can't handle
+    with profiling.stage('merge-result'):
+        result = merger.result()
+    with profiling.stage('yaml-dump', output_yaml) as st:
+        yaml_str = saveyaml.dump(result)
+        st.bytes_out = len(yaml_str)
+    with profiling.stage('write', output_yaml, bytes_out=len(yaml_str)):
+        with open(output_yaml, 'w', encoding='utf-8') as f:
+            f.write(yaml_str)
     if compressed:
         compressed_txt = str(Path(output_yaml).with_suffix('')) + '_compressed.txt'
-        yaml_str = yaml.safe_dump(obj, allow_unicode=True, sort_keys=False)
-        compressed = zlib.compress(yaml_str.encode('utf-8'))
+        yaml_bytes = yaml_str.encode('utf-8')
+        with profiling.stage('zlib-compress', bytes_in=len(yaml_bytes)):
+            compressed = zlib.compress(yaml_bytes)
         b64 = base64.b64encode(compressed).decode('ascii')
         with open(compressed_txt, 'w', encoding='utf-8') as f:
             f.write(b64)
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Extract missionsets and/or collectibles from a YAML save file.")
-    parser.add_argument('-i', '--input', required=True, help='Input YAML file')
+    parser = argparse.ArgumentParser(description="Extract missionsets and/or collectibles from save files.")
+    parser.add_argument('-i', '--input', nargs='+', required=True, help='Input YAML/.sav file(s) or directories. All are merged in one pass.')
     parser.add_argument('-m', '--missions-out', help='Output YAML file for missionsets')
     parser.add_argument('-mc', '--missions-comp', action='store_true', help='Output compressed base64 file for missionsets')
     parser.add_argument('-c', '--collectibles-out', help='Output YAML file for collectibles')
     parser.add_argument('-cc', '--collectibles-comp', action='store_true', help='Output compressed base64 file for collectibles')
     parser.add_argument('-u', '--unlockables-out', help='Output YAML file for unlockables. (profile.sav)')
     parser.add_argument('-uc', '--unlockables-comp', action='store_true', help='Output compressed base64 file for unlockables')
+    parser.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    parser.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+    profiling.add_arguments(parser)
     args = parser.parse_args()
+    profiling.start(args)
 
     if not args.missions_out and not args.collectibles_out and not args.unlockables_out:
         print("Error: At least one of --missions-out or --collectibles-out or --unlockables-out must be specified.", file=sys.stderr)
         sys.exit(1)
 
-    with open(args.input, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-
+    paths = []
     if args.missions_out:
-        missionsets = extract_missionsets(data)
-        write_yaml_and_compressed(missionsets, args.missions_out, args.missions_comp)
-        print(f"Extracted {len(missionsets)} missionsets.")
-
+        paths.append(MISSIONSETS_PATH)
     if args.collectibles_out:
-        collectibles = sort_dict(extract_collectibles(data))
-        write_yaml_and_compressed(collectibles, args.collectibles_out, args.collectibles_comp)
-        print(f"Extracted {len(collectibles)} collectible categories.")
+        paths.append(COLLECTIBLES_PATH)
+    if args.unlockables_out:
+        paths.append(UNLOCKABLES_PATH)
+
+    missions_merger = output_merger(args.missions_out) if args.missions_out else None
+    collectibles_merger = output_merger(args.collectibles_out) if args.collectibles_out else None
+    unlockables_merger = output_merger(args.unlockables_out) if args.unlockables_out else None
 
+    # Saves are loaded/decrypted on worker processes; merging happens here in input order
+    for input_path, (missionsets, collectibles, unlockables) in corpus.map_saves(extract_outputs, args.input, paths, args.userid, args.jobs):
+        if args.missions_out:
+            missions_merger.add(missionsets)
+            print(f"Extracted {len(missionsets)} missionsets from {input_path}.")
+        if args.collectibles_out:
+            collectibles_merger.add(collectibles)
+            print(f"Extracted {len(collectibles)} collectible categories from {input_path}.")
+        if args.unlockables_out:
+            unlockables_merger.add(unlockables)
+            print(f"Extracted {len(unlockables)} unlockables categories from {input_path}.")
+
+    if args.missions_out:
+        write_yaml_and_compressed(missions_merger, args.missions_out, args.missions_comp)
+    if args.collectibles_out:
+        write_yaml_and_compressed(collectibles_merger, args.collectibles_out, args.collectibles_comp)
     if args.unlockables_out:
-        unlockables = sort_dict(extract_global_unlockables(data))
-        write_yaml_and_compressed(unlockables, args.unlockables_out, args.unlockables_comp)
-        print(f"Extracted {len(unlockables)} unlockables categories.")
+        write_yaml_and_compressed(unlockables_merger, args.unlockables_out, args.unlockables_comp)
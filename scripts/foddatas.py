@@ -1,73 +1,148 @@
 #!/usr/bin/env python3
 # extract/inject fog of war data from/to a Borderlands 4 YAML save file
 
-import yaml
-import base64
-import zlib
+import csv
 from pathlib import Path
 
-def unknown_tag(loader, tag_suffix, node):
-    if isinstance(node, yaml.SequenceNode):
-        return loader.construct_sequence(node)
-    elif isinstance(node, yaml.MappingNode):
-        return loader.construct_mapping(node)
-    else:
-        return loader.construct_scalar(node)
+import corpus
+import fogcodec
+import profiling
+import saveyaml
+from savepatch import SavePatch
+
+FODDATAS_PATHS = ['gbx_discovery_pc.foddatas']
 
-yaml.SafeLoader.add_multi_constructor('!', unknown_tag)
 
 def extract_foddatas(yaml_path, output_dir):
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
+    with profiling.stage('load', yaml_path):
+        data = saveyaml.load_paths(yaml_path, FODDATAS_PATHS)
 
     foddatas = data['gbx_discovery_pc']['foddatas']
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    for entry in foddatas:
-        levelname = entry['levelname']
-        foddata_b64 = entry['foddata']
-        compressed = base64.b64decode(foddata_b64)
-        decompressed = zlib.decompress(compressed)
+    for levelname, level in fogcodec.decode_levels(foddatas).items():
         out_file = output_dir / f"{levelname}.bin"
         with open(out_file, 'wb') as out:
-            out.write(decompressed)
+            out.write(level)
         print(f"Extracted {levelname} to {out_file}")
 
 def inject_foddata(yaml_path, input_dir, output_yaml, fill_ff=False):
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-
-    foddatas = data['gbx_discovery_pc']['foddatas']
+    # Patch the foddata scalars in place so the rest of the file is left untouched
+    patch = SavePatch.from_file(yaml_path)
     input_dir = Path(input_dir) if input_dir else None
 
-    for entry in foddatas:
-        levelname = entry['levelname']
+    nodes = {}
+    raws = {}
+    for entry in patch.node('gbx_discovery_pc.foddatas').value:
+        levelname = patch.node('levelname', entry).value
+        nodes[levelname] = patch.node('foddata', entry)
         if fill_ff:
-            raw = bytes([0xFF] * 16384)
             print(f"Injecting all-FF data into {levelname}")
         else:
             in_file = input_dir / f"{levelname}.bin"
             if in_file.exists():
                 with open(in_file, 'rb') as inp:
-                    raw = inp.read()
+                    raws[levelname] = inp.read()
                 print(f"Injected {in_file} into {levelname}")
             else:
                 print(f"Warning: {in_file} not found, skipping.")
-                continue
-        compressed = zlib.compress(raw)
-        foddata_b64 = base64.b64encode(compressed).decode('ascii')
-        entry['foddata'] = foddata_b64
+
+    if fill_ff:
+        encoded = {levelname: fogcodec.fill(0xFF) for levelname in nodes}
+    else:
+        encoded = fogcodec.encode_levels(raws)
+    for levelname, foddata_b64 in encoded.items():
+        patch.set(nodes[levelname], foddata_b64)
 
     # Write back to YAML (overwrite or to new file)
     out_path = output_yaml or yaml_path
-    with open(out_path, 'w', encoding='utf-8') as f:
-        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    patch.write(out_path)
     print(f"Updated YAML written to {out_path}")
 
+def fog_levels(data):
+    # Returns {levelname: raw bytes}; plain bytes pickle cheaply back from worker processes
+    foddatas = data.get('gbx_discovery_pc', {}).get('foddatas', [])
+    return {levelname: bytes(level) for levelname, level in fogcodec.decode_levels(foddatas).items()}
+
+def stack_fog_levels(saves, names=None):
+    """
+    {levelname: (rows, stack)}: for each level, the indices of the saves that have a map for it and
+    their maps stacked into one (len(rows), FOG_SIZE) uint8 array. names label saves in errors.
+    """
+    np = fogcodec.np
+    levelnames = sorted({levelname for levels in saves for levelname in levels})
+    stacks = {}
+    for levelname in levelnames:
+        rows = [i for i, levels in enumerate(saves) if levelname in levels]
+        stack = np.empty((len(rows), fogcodec.FOG_SIZE), dtype=np.uint8)
+        for row, i in enumerate(rows):
+            level = saves[i][levelname]
+            if len(level) != fogcodec.FOG_SIZE:
+                save = names[i] if names else f"save {i}"
+                raise ValueError(f"{levelname} in {save}: fog map is {len(level)} bytes, expected {fogcodec.FOG_SIZE}")
+            stack[row] = np.frombuffer(level, dtype=np.uint8)
+        stacks[levelname] = (rows, stack)
+    return stacks
+
+def write_pgm(path, level):
+    # 8-bit grayscale image, viewable without any imaging library
+    with open(path, 'wb') as out:
+        out.write(f"P5 {fogcodec.FOG_DIM} {fogcodec.FOG_DIM} 255\n".encode('ascii'))
+        out.write(bytes(level))
+
+def analyze_foddatas(inputs, heatmap_dir=None, csv_path=None, user_id=None, workers=None):
+    fogcodec.require_numpy()
+    np = fogcodec.np
+    save_paths, saves = [], []
+    skipped = 0
+    for save_path, levels in corpus.map_saves(fog_levels, inputs, FODDATAS_PATHS, user_id, workers):
+        if not levels:
+            # profile.yaml and other non-character files have no fog data at all
+            skipped += 1
+            continue
+        save_paths.append(save_path)
+        saves.append(levels)
+    with profiling.stage('stack'):
+        stacks = stack_fog_levels(saves, save_paths)
+    if heatmap_dir:
+        heatmap_dir = Path(heatmap_dir)
+        heatmap_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"{len(saves)} saves, {len(stacks)} levels")
+    if skipped:
+        print(f"Skipped {skipped} saves without fog data")
+    print(f"{'level':<28} {'saves':>6} {'mean':>7} {'min':>7} {'max':>7} {'union':>7} {'inter':>7}")
+    per_save = {}
+    for levelname, (rows, stack) in stacks.items():
+        explored = stack.mean(axis=1) / 0xFF
+        union = stack.max(axis=0)
+        intersection = stack.min(axis=0)
+        per_save[levelname] = dict(zip(rows, explored))
+        print(
+            f"{levelname:<28} {len(rows):>6} {explored.mean():7.2%} {explored.min():7.2%} {explored.max():7.2%} "
+            f"{fogcodec.coverage(union):7.2%} {fogcodec.coverage(intersection):7.2%}"
+        )
+        if heatmap_dir:
+            write_pgm(heatmap_dir / f"{levelname}_mean.pgm", np.rint(stack.mean(axis=0)).astype(np.uint8))
+            write_pgm(heatmap_dir / f"{levelname}_union.pgm", union)
+            write_pgm(heatmap_dir / f"{levelname}_intersection.pgm", intersection)
+
+    if csv_path:
+        with open(csv_path, 'w', encoding='utf-8', newline='') as out:
+            writer = csv.writer(out)
+            writer.writerow(['save'] + list(per_save))
+            for i, save_path in enumerate(save_paths):
+                # Blank where a save has no map for the level
+                writer.writerow([save_path] + [f"{per_save[levelname][i]:.6f}" if i in per_save[levelname] else ''
+                                               for levelname in per_save])
+        print(f"Per-save coverage written to {csv_path}")
+    if heatmap_dir:
+        print(f"Heatmaps written to {heatmap_dir}")
+
 if __name__ == "__main__":
     import argparse
-    parser = argparse.ArgumentParser(description="Extract/inject fog of war data from/to a YAML save file")
+    parser = argparse.ArgumentParser(description="Extract/inject/analyze fog of war data from/to YAML save files")
 
     sub = parser.add_subparsers(dest="cmd", required=True)
 
@@ -88,7 +163,20 @@ if __name__ == "__main__":
     p_inject.add_argument('--outputyaml', help='Output YAML file', required=True)
     p_inject.add_argument('--fill', action='store_true', help='Inject 16KB of all-0xFF data for every level (overrides inputdir)')
 
+    p_analyze = sub.add_parser(
+        "analyze",
+        help="Compare fog of war coverage across many save files (YAML or .sav)",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    p_analyze.add_argument('inputs', nargs='+', help='Input YAML/.sav files or directories')
+    p_analyze.add_argument('--heatmapdir', help='Directory for per-level mean/union/intersection heatmaps (.pgm)')
+    p_analyze.add_argument('--csv', help='Output CSV of explored fraction per save and level')
+    p_analyze.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    p_analyze.add_argument('-j', '--jobs', type=int, help='Worker processes for loading saves (default: CPU count)')
+    profiling.add_arguments(parser)
+
     args = parser.parse_args()
+    profiling.start(args)
 
     if args.cmd == "extract":
         extract_foddatas(args.inputyaml, args.outputdir)
@@ -99,5 +187,7 @@ if __name__ == "__main__":
             output_yaml=args.outputyaml,
             fill_ff=args.fill
         )
+    elif args.cmd == "analyze":
+        analyze_foddatas(args.inputs, args.heatmapdir, args.csv, args.userid, args.jobs)
     else:
-        print("Please specify either extract or inject")
+        print("Please specify either extract, inject or analyze")
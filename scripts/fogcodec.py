@@ -0,0 +1,88 @@
+# Fog of war (foddata) codec for Borderlands 4 saves
+# Each level is a 128x128 grid, one byte per cell (0x00 hidden .. 0xFF fully revealed),
+# stored zlib-compressed and base64-encoded. See docs/exploration.md.
+
+import base64
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import profiling
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FOG_DIM = 128
+FOG_SIZE = FOG_DIM * FOG_DIM
+
+
+def decode(foddata_b64):
+    return zlib.decompress(base64.b64decode(foddata_b64))
+
+
+def encode(raw):
+    return base64.b64encode(zlib.compress(bytes(raw))).decode('ascii')
+
+
+@lru_cache(maxsize=None)
+def fill(value=0xFF, size=FOG_SIZE):
+    """Encoded foddata for a constant map, e.g. fill() reveals the whole level. Computed once per value."""
+    return encode(bytes([value]) * size)
+
+
+def as_array(raw):
+    """View a decoded map as a uint8 NumPy array (or a memoryview without NumPy). No copy is made."""
+    if np is None:
+        return memoryview(raw)
+    return np.frombuffer(raw, dtype=np.uint8)
+
+
+def _map(func, items, workers):
+    # zlib releases the GIL, so a thread pool decodes/encodes levels in parallel
+    if len(items) <= 1:
+        return list(map(func, items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def decode_levels(foddatas, workers=None):
+    """Decode every entry of gbx_discovery_pc.foddatas into {levelname: array}."""
+    names = [entry['levelname'] for entry in foddatas]
+    encoded = [entry['foddata'] for entry in foddatas]
+    with profiling.stage('fog-decode', bytes_in=sum(map(len, encoded)), bytes_out=len(encoded) * FOG_SIZE):
+        raws = _map(decode, encoded, workers)
+    return {name: as_array(raw) for name, raw in zip(names, raws)}
+
+
+def encode_levels(levels, workers=None):
+    """Encode {levelname: bytes/array} into {levelname: foddata string}."""
+    names = list(levels)
+    with profiling.stage('fog-encode', bytes_in=sum(len(levels[name]) for name in names)) as st:
+        encoded = _map(encode, [levels[name] for name in names], workers)
+        st.bytes_out = sum(map(len, encoded))
+    return dict(zip(names, encoded))
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for fog map analysis (pip install numpy)")
+
+
+def coverage(level):
+    """Explored fraction of a level, 0.0 - 1.0, counting partially revealed cells proportionally."""
+    require_numpy()
+    return float(np.asarray(level, dtype=np.uint8).mean()) / 0xFF
+
+
+def union(*levels):
+    """Cell-wise maximum: what any of the maps has revealed."""
+    require_numpy()
+    return np.maximum.reduce([np.asarray(level, dtype=np.uint8) for level in levels])
+
+
+def intersection(*levels):
+    """Cell-wise minimum: what all of the maps have revealed."""
+    require_numpy()
+    return np.minimum.reduce([np.asarray(level, dtype=np.uint8) for level in levels])
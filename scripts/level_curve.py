@@ -1,151 +1,299 @@
 # Analyze XP requirements for character and specialization levels in Borderlands 4
+# fit_curve() returns plain data (splits, coefficients, metrics) and to_js()/JSON output regenerate
+# the formulas in assets/calculators.js. Only NumPy is needed; matplotlib is imported for plots.
 
+import argparse
+import csv
+import json
+import math
 from pathlib import Path
+
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
 
-plt.style.use('dark_background')
+DATA_DIR = Path(__file__).parent / '../data'
+
+# The analyses behind assets/calculators.js. The fit only sees the sampled levels, so where the
+# calculators use hand-picked segment starts (which segment covers the gaps between samples) and
+# rounder safety margins, they are pinned here and to_js() reproduces the published curve.
+CURVES = {
+    'Character': {'csv_path': DATA_DIR / 'xp_character.csv', 'n_segments': 1},
+    'Specialization': {
+        'csv_path': DATA_DIR / 'xp_specialization.csv', 'n_segments': 4,
+        'starts': [11, 32, 201, 500], 'margins': [1.8, 2.6, 0.01, 0.001],
+    },
+}
+
 
 def piecewise_polyfit(levels, xp, degree=2, n_segments=2, min_size=5):
+    """
+    Split the data into n_segments contiguous segments and fit a polynomial to each, minimizing the
+    summed per-segment MSE. Segments have at least min_size points (the last one min_size + 1).
+    Each interval is fitted once and the best split is found by dynamic programming; on ties the
+    lowest split indices win, as with trying every combination in order.
+    """
     n = len(levels)
     if n_segments == 1:
         coefs = [np.polyfit(levels, xp, degree)]
         return [], coefs
 
-    # Generate all valid combinations of split indices
-    def generate_splits(n, n_segments, min_size):
-        if n_segments == 1:
-            return [[]]
-        splits = []
-        for i in range(min_size, n - min_size * (n_segments - 1)):
-            for rest in generate_splits(n - i, n_segments - 1, min_size):
-                splits.append([i] + [i + r for r in rest])
-        return splits
-
-    best_splits = None
-    best_error = float('inf')
-    best_coefs = None
-
-    split_candidates = generate_splits(n, n_segments, min_size)
-    for split_idxs in split_candidates:
-        indices = [0] + split_idxs + [n]
-        coefs_list = []
-        mse_total = 0
-        for seg in range(n_segments):
-            start, end = indices[seg], indices[seg + 1]
+    errors = {}
+
+    def segment_error(start, end):
+        if (start, end) not in errors:
             x_seg, y_seg = levels[start:end], xp[start:end]
             if len(x_seg) < degree + 1:
-                mse_total = float('inf')
-                break
-            coefs = np.polyfit(x_seg, y_seg, degree)
-            pred = np.polyval(coefs, x_seg)
-            mse_total += np.mean((y_seg - pred) ** 2)
-            coefs_list.append(coefs)
-        if mse_total < best_error:
-            best_error = mse_total
-            best_splits = split_idxs
-            best_coefs = coefs_list
+                errors[start, end] = float('inf')
+            else:
+                pred = np.polyval(np.polyfit(x_seg, y_seg, degree), x_seg)
+                errors[start, end] = np.mean((y_seg - pred) ** 2)
+        return errors[start, end]
 
+    # best[k][end]: lowest error covering levels[:end] with k segments, summed left to right;
+    # prev[k][end]: every start of the k-th segment that reaches it
+    best = [{0: 0}]
+    prev = [{}]
+    for k in range(1, n_segments + 1):
+        last = k == n_segments
+        ends = [n] if last else range(min_size * k, n - min_size * (n_segments - k))
+        best.append({})
+        prev.append({})
+        for end in ends:
+            totals = {start: total + segment_error(start, end)
+                      for start, total in best[k - 1].items()
+                      if end - start >= min_size + last}
+            if not totals:
+                continue
+            lowest = min(totals.values())
+            best[k][end] = lowest
+            prev[k][end] = [start for start, total in totals.items() if total == lowest]
+
+    if best[n_segments].get(n, float('inf')) == float('inf'):
+        return None, None
+
+    # Walk back to mark every split on an optimal path, then take the earliest ones going forward
+    optimal = [set() for _ in range(n_segments + 1)]
+    optimal[n_segments].add(n)
+    for k in range(n_segments, 0, -1):
+        for end in optimal[k]:
+            optimal[k - 1].update(prev[k][end])
+    indices = [0]
+    for k in range(1, n_segments + 1):
+        indices.append(min(end for end in optimal[k] if indices[-1] in prev[k][end]))
+
+    best_splits = indices[1:-1]
+    best_coefs = [np.polyfit(levels[indices[i]:indices[i + 1]], xp[indices[i]:indices[i + 1]], degree)
+                  for i in range(n_segments)]
     return best_splits, best_coefs
 
-def analyze_piecewise_curve(csv_path, label, skip_levels=10, degree=3, n_segments=2, predict=False, ax=None):
-    # Load and clean data
-    df = pd.read_csv(csv_path)
-    df = df.dropna(subset=['points_total'])
-    df['level'] = df['level'].astype(int)
-    df['points_total'] = df['points_total'].astype(int)
-    df = df[df['level'] > skip_levels]
-    levels = df['level'].to_numpy()
-    xp = df['points_total'].to_numpy()
-
-    # Find best split and fit polynomials
+def load_xp(csv_path):
+    """Levels and total XP from an xp_*.csv, skipping rows without a total."""
+    levels, xp = [], []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row['points_total']:
+                levels.append(int(row['level']))
+                xp.append(int(row['points_total']))
+    return np.array(levels), np.array(xp)
+
+
+def fit_curve(csv_path, label, skip_levels=10, degree=3, n_segments=2):
+    """
+    Fit the XP curve for one table. Returns a JSON-serializable dict with the split levels and,
+    per segment, coefficients (highest power first), MSE, R² and divergence from the known data.
+    Levels up to skip_levels are kept as exact values instead of being fitted.
+    """
+    all_levels, all_xp = load_xp(csv_path)
+    keep = all_levels > skip_levels
+    levels, xp = all_levels[keep], all_xp[keep]
+
     best_splits, best_coefs = piecewise_polyfit(levels, xp, degree=degree, n_segments=n_segments)
+    if best_coefs is None:
+        raise ValueError(f"not enough data points for {n_segments} segments of degree {degree}")
     indices = [0] + best_splits + [len(levels)]
-    split_levels = [levels[i] for i in best_splits]
 
-    print(f"\n=== {label} Piecewise Polynomial Fit (degree={degree}, segments={n_segments}) ===")
-    if split_levels:
-        print(f"Best splits at levels: {[int(lvl) for lvl in split_levels]}")
-
-    # Print formulas and metrics for each segment
+    segments = []
     for i in range(n_segments):
-        start, end = indices[i], indices[i + 1]
-        x_seg, y_seg = levels[start:end], xp[start:end]
+        x_seg, y_seg = levels[indices[i]:indices[i + 1]], xp[indices[i]:indices[i + 1]]
         coefs = best_coefs[i]
         pred = np.polyval(coefs, x_seg)
-        mse = np.mean((y_seg - pred) ** 2)
-        r2 = 1 - np.sum((y_seg - pred) ** 2) / np.sum((y_seg - np.mean(y_seg)) ** 2)
-        def poly_str(coefs):
-            if degree == 2:
-                return f"{coefs[0]:.6f} * level^2 + {coefs[1]:.6f} * level + {coefs[2]:.6f}"
-            elif degree == 3:
-                return f"{coefs[0]:.6f} * level^3 + {coefs[1]:.6f} * level^2 + {coefs[2]:.6f} * level + {coefs[3]:.6f}"
-            else:
-                return " + ".join([f'{c:.6f} * level^{degree-i}' for i, c in enumerate(coefs)])
-
-        print(f"\nSegment {i+1} (levels {x_seg[0]} to {x_seg[-1]}):")
-        print(f"  MSE: {mse:.2f}, R²: {r2:.8f}")
-        print(f"\n  XP = {poly_str(coefs)}")
-
-        # Print as JavaScript function
-        print(
-            "\n  return (\n"
-            f"    {coefs[0]:.6f} * Math.pow(level, 3) +\n"
-            f"    {coefs[1]:.6f} * Math.pow(level, 2) +\n"
-            f"    {coefs[2]:.6f} * level +\n"
-            f"    {coefs[3]:.6f}\n  );\n"
-        )
-
-        print("  Divergence for known data points:")
-        for lvl_val, actual, pred_val in zip(x_seg, y_seg, pred):
-            diff = pred_val - actual
-            pct = abs(100 * diff / actual if actual != 0 else 0)
-            print(f"    Level {lvl_val:3d}: {diff:+6.0f} {pct:7.5f}%")
-        max_div = np.max(np.abs(y_seg - pred))
-        max_div_pct = np.max(np.abs((y_seg - pred) / y_seg) * 100)
-        print(f"  Max =======: {max_div:6.0f} {max_div_pct:7.5f}%")
+        segments.append({
+            'start': int(x_seg[0]),
+            'end': int(x_seg[-1]),
+            'coefs': [float(c) for c in coefs],
+            'mse': float(np.mean((y_seg - pred) ** 2)),
+            'r2': float(1 - np.sum((y_seg - pred) ** 2) / np.sum((y_seg - np.mean(y_seg)) ** 2)),
+            'divergence': [
+                {'level': int(lvl), 'actual': int(actual), 'predicted': float(p)}
+                for lvl, actual, p in zip(x_seg, y_seg, pred)
+            ],
+            'max_divergence': float(np.max(np.abs(y_seg - pred))),
+            'max_divergence_pct': float(np.max(np.abs((y_seg - pred) / y_seg) * 100)),
+        })
+
+    exact = dict(zip(all_levels.tolist(), all_xp.tolist()))
+    exact.setdefault(1, 0)
+    return {
+        'label': label,
+        'degree': degree,
+        'skip_levels': skip_levels,
+        'splits': [int(levels[i]) for i in best_splits],
+        'exact': [exact.get(lvl) for lvl in range(1, skip_levels + 1)],
+        'segments': segments,
+    }
+
+
+def poly_str(coefs):
+    degree = len(coefs) - 1
+    return " + ".join(
+        f"{c:.6f} * level^{degree - i}" if degree - i > 1 else f"{c:.6f} * level" if degree - i == 1 else f"{c:.6f}"
+        for i, c in enumerate(coefs)
+    )
 
+
+def format_report(result, predict=False):
+    """The human-readable report, with formulas, JS return statements and per-level divergence."""
+    n_segments = len(result['segments'])
+    lines = [f"\n=== {result['label']} Piecewise Polynomial Fit (degree={result['degree']}, segments={n_segments}) ==="]
+    if result['splits']:
+        lines.append(f"Best splits at levels: {result['splits']}")
+    for i, seg in enumerate(result['segments']):
+        lines.append(f"\nSegment {i+1} (levels {seg['start']} to {seg['end']}):")
+        lines.append(f"  MSE: {seg['mse']:.2f}, R²: {seg['r2']:.8f}")
+        lines.append(f"\n  XP = {poly_str(seg['coefs'])}")
+        terms = js_polynomial(seg['coefs'], ' +\n    ')
+        lines.append(f"\n  return (\n    {terms}\n  );\n")
+        lines.append("  Divergence for known data points:")
+        for point in seg['divergence']:
+            diff = point['predicted'] - point['actual']
+            pct = abs(100 * diff / point['actual'] if point['actual'] != 0 else 0)
+            lines.append(f"    Level {point['level']:3d}: {diff:+6.0f} {pct:7.5f}%")
+        lines.append(f"  Max =======: {seg['max_divergence']:6.0f} {seg['max_divergence_pct']:7.5f}%")
         if predict:
-            print("\n  Predicted XP for 5-level intervals within the segment:")
-            start_lvl = int(x_seg[0])
-            end_lvl = int(x_seg[-1])
-            for lvl in range(start_lvl, end_lvl + 1, 5):
-                pred = np.polyval(best_coefs[i], lvl)
-                print(f"    Level {lvl:3d}: {pred:.0f}")
-
-    # Plotting
-    ax.scatter(levels, xp, label=f'XP')
+            lines.append("\n  Predicted XP for 5-level intervals within the segment:")
+            for lvl in range(seg['start'], seg['end'] + 1, 5):
+                lines.append(f"    Level {lvl:3d}: {np.polyval(seg['coefs'], lvl):.0f}")
+    return "\n".join(lines)
+
+
+def js_number(value):
+    return f"{value:.6f}".rstrip('0').rstrip('.')
+
+
+def js_polynomial(coefs, sep=' + '):
+    degree = len(coefs) - 1
+    terms = []
+    for i, c in enumerate(coefs):
+        power = degree - i
+        if power > 1:
+            terms.append(f"{js_number(c)} * Math.pow(level, {power})")
+        elif power == 1:
+            terms.append(f"{js_number(c)} * level")
+        else:
+            terms.append(js_number(c))
+    return sep.join(terms)
+
+
+def safety_margin(max_divergence_pct):
+    """Smallest 1-2 significant digit percentage at or above the worst divergence, e.g. 1.749 -> 1.8."""
+    if max_divergence_pct <= 0:
+        return 0
+    step = 10 ** (math.floor(math.log10(max_divergence_pct)) - 1)
+    return round(math.ceil(max_divergence_pct / step) * step, 10)
+
+
+def to_js(result, starts=None, margins=None):
+    """
+    A calculate<Label>Xp(level) function in the style of assets/calculators.js. starts and margins
+    override each segment's first level and safety margin (%); by default a segment starts at its
+    first sampled level and the margin is the smallest round value covering its divergence.
+    """
+    label = result['label']
+    segments = result['segments']
+    if starts is None:
+        starts = [result['skip_levels'] + 1] + [seg['start'] for seg in segments[1:]]
+    if margins is None:
+        margins = [safety_margin(seg['max_divergence_pct']) for seg in segments]
+    for seg, margin in zip(segments, margins):
+        if margin < seg['max_divergence_pct']:
+            raise ValueError(f"{label} margin {margin}% for levels {seg['start']}-{seg['end']} is below its "
+                             f"{seg['max_divergence_pct']:.4f}% divergence")
+    out = [f"function calculate{label}Xp(level) {{"]
+    exact = result['exact']
+    if exact and None not in exact:
+        out += [
+            f"  // Hardcoded total XP for levels 1-{len(exact)}",
+            f"  const hardcoded = [{', '.join(map(str, exact))}];",
+            f"  if (level > 0 && level <= {len(exact)}) {{",
+            "    return hardcoded[level - 1];",
+            "  }",
+        ]
+    for i, seg in enumerate(segments):
+        margin = margins[i]
+        start = starts[i]
+        terms = js_polynomial(seg['coefs'], ' +\n  ')
+        body = [
+            "const base =",
+            f"  {terms};",
+            f"// Safety margin: {js_number(margin)}%",
+            f"return Math.round(base * {1 + margin / 100:.12g});",
+        ]
+        if len(segments) == 1:
+            out.append("")
+            out += ["  " + line.replace("\n", "\n  ") for line in body]
+            break
+        last = i == len(segments) - 1
+        end = None if last else starts[i + 1] - 1
+        out.append("")
+        out.append(f"  // Segment {i + 1}: levels {start}{'+' if last else f'–{end}'}")
+        out.append(f"  if (level >= {start}{'' if last else f' && level <= {end}'}) {{")
+        out += ["    " + line.replace("\n", "\n    ") for line in body]
+        out.append("  }")
+    else:
+        out += ["", "  return 0;"]
+    out.append("}")
+    return "\n".join(out)
+
+
+def plot_curve(result, csv_path, ax):
+    # Imported here so fitting and JSON/JS output work without matplotlib
+    import matplotlib.ticker as mticker
+    levels, xp = load_xp(csv_path)
+    keep = levels > result['skip_levels']
+    ax.scatter(levels[keep], xp[keep], label='XP')
     colors = ['orange', 'red', 'green', 'blue']
-    for i in range(n_segments):
-        start, end = indices[i], indices[i + 1]
-        x_seg = levels[start:end]
-        x_fine = np.linspace(x_seg.min(), x_seg.max(), 100)
-        ax.plot(x_fine, np.polyval(best_coefs[i], x_fine), label=f'Fit {i+1}', color=colors[i % len(colors)])
+    for i, seg in enumerate(result['segments']):
+        x_fine = np.linspace(seg['start'], seg['end'], 100)
+        ax.plot(x_fine, np.polyval(seg['coefs'], x_fine), label=f'Fit {i+1}', color=colors[i % len(colors)])
     ax.set_xlabel('Level')
     ax.set_ylabel('Total XP')
-    ax.set_title(f'{label} Piecewise Polynomial Fit')
+    ax.set_title(f"{result['label']} Piecewise Polynomial Fit")
     ax.legend()
     ax.yaxis.set_major_formatter(mticker.StrMethodFormatter('{x:,.0f}'))
 
+
 if __name__ == "__main__":
-    script_dir = Path(__file__).parent
-    char_csv = script_dir / '../data/xp_character.csv'
-    spec_csv = script_dir / '../data/xp_specialization.csv'
-
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-    analyze_piecewise_curve(
-        char_csv,
-        "Character",
-        n_segments=1,
-        ax=ax1
-    )
-    analyze_piecewise_curve(
-        spec_csv,
-        "Specialization",
-        n_segments=4,
-        ax=ax2
-    )
-    plt.tight_layout()
-    plt.show()
+    parser = argparse.ArgumentParser(description="Fit XP curves to data/xp_*.csv and print formulas")
+    parser.add_argument('-f', '--format', choices=['text', 'json', 'js'], default='text',
+                        help='text report (default), JSON results or calculators.js functions')
+    parser.add_argument('--no-plot', action='store_true', help='Skip the matplotlib figure (text format only; json/js never plot)')
+    parser.add_argument('--predict', action='store_true', help='Also print predicted XP every 5 levels')
+    args = parser.parse_args()
+
+    results = {label: fit_curve(curve['csv_path'], label, n_segments=curve['n_segments']) for label, curve in CURVES.items()}
+
+    if args.format == 'json':
+        print(json.dumps(results, indent=2))
+    elif args.format == 'js':
+        print("\n\n".join(to_js(result, CURVES[label].get('starts'), CURVES[label].get('margins'))
+                            for label, result in results.items()))
+    else:
+        for result in results.values():
+            print(format_report(result, args.predict))
+        if not args.no_plot:
+            import matplotlib.pyplot as plt
+            plt.style.use('dark_background')
+            fig, axes = plt.subplots(1, len(results), figsize=(14, 6))
+            for ax, (label, result) in zip(axes, results.items()):
+                plot_curve(result, CURVES[label]['csv_path'], ax)
+            plt.tight_layout()
+            plt.show()
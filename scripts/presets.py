@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# Preset modifications for Borderlands 4 saves (port of the web editor's quick mods)
+# A save is parsed once, every selected preset edits the tree in place and it's dumped once,
+# where the web editor re-parses and re-dumps the whole document for every step.
+# Template data comes from data/ (locations.txt, missions.yaml, collectibles.yaml, challenge_counters.csv, xp_*.csv)
+# via the compiled data pack.
+
+import argparse
+import copy
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import corpus
+import datapack
+import dlcodec
+import fogcodec
+import profiling
+import saveyaml
+
+MAX_LEVEL = 50
+MAX_SPECIALIZATION_LEVEL = 701
+MAX_CURRENCY = 2147483647
+
+FOG_LEVELNAMES = [
+    'Intro_P', 'World_P',
+    'Vault_Grasslands_P', 'Fortress_Grasslands_P',
+    'Vault_ShatteredLands_P', 'Fortress_Shatteredlands_P',
+    'Vault_Mountains_P', 'Fortress_Mountains_P',
+    'ElpisElevator_P', 'Elpis_P', 'UpperCity_P',
+]
+WORLDS = [
+    'Intro_P', 'World_P',
+    'Fortress_Grasslands_P', 'Vault_Grasslands_P',
+    'Fortress_Shatteredlands_P', 'Vault_ShatteredLands_P',
+    'Fortress_Mountains_P', 'Vault_Mountains_P',
+    'ElpisElevator_P', 'Elpis_P', 'UpperCity_P',
+]
+REGIONS = [
+    'KairosGeneric', 'grasslands_Prison',
+    'grasslands_RegionA', 'grasslands_RegionB', 'grasslands_RegionC', 'grasslands_RegionD', 'grasslands_RegionE',
+    'Grasslands_Fortress', 'Grasslands_Vault',
+    'shatteredlands_RegionA', 'shatteredlands_RegionB', 'shatteredlands_RegionC', 'shatteredlands_RegionD', 'shatteredlands_RegionE',
+    'shatteredlands_Fortress', 'shatteredlands_Vault',
+    'mountains_RegionA', 'mountains_RegionB', 'mountains_RegionC', 'mountains_RegionD', 'mountains_RegionE',
+    'Mountains_Fortress', 'Mountains_Vault',
+    'elpis_elevator', 'elpis',
+    'city_RegionA', 'city_RegionB', 'city_RegionC', 'city_Upper',
+]
+
+# POI markers for safehouses, silos and towns
+SAFEHOUSE_LOCATION_PREFIX = 'DLMD_World_P_PoAActor_UAID_'
+SAFEHOUSE_LOCATIONS = [
+    '02504100000113ED01_1588318775', '025041000001181202_1219939729', '0250410000015FED01_1875042151',
+    '02504100000187D401_1882517809', '047C1619B44AA00302_1687647825', '04922658D4A72CD401_1798204775',
+    '04922658D4A75EE201_1362582382', '04922658D4A791C201_1271147543', '089204DCF485770E02_1192963223',
+    '089204DCF7EF120E02_2035944540', '089204DCF7EF92FA01_2135167885', '089204DCF7EFD0FA01_1541512767',
+    '089204DCF7EFF40F02_1177657411', '14F6D87D57071BD501_1530198843', '14F6D87D570787D401_1419323791',
+    '244BFE96422D31D401_2101065829', '244BFE96422DA2F901_1897336641', '244BFE96422DC5FC01_1346905034',
+    '34CFF6FF1DA56FD601_1995548687', '5811224CB62827D501_1937969200', '5811224CB62835D501_1890737431',
+    '907841CAD86511F801_1501116063', 'B04F130572E120DB01_1153963055', 'CC96E5191F743DD401_1223726776',
+    'CC96E5191F74B8E601_1603838428', 'CC96E5191F74D2D401_1997150008',
+]
+
+MISSION_PREFIXES = {
+    'all': 'missionset_',
+    'story': 'missionset_main_',
+    'activity': 'missionset_zoneactivity_',
+    'safehouse': 'missionset_zoneactivity_safehouse',
+    'silo': 'missionset_zoneactivity_silo',
+}
+
+ACTIVITY_MISSIONSETS = [
+    'missionset_zoneactivity_crawler',
+    'missionset_zoneactivity_drillsite',
+    'missionset_zoneactivity_mine',
+    'missionset_zoneactivity_orderbunker',
+    'missionset_zoneactivity_safehouse',
+    'missionset_zoneactivity_silo',
+]
+ACTIVITY_SDU_POINTS = 40
+COLLECTIBLE_SDU_POINTS = {
+    'propaspeakers': 20,
+    'capsules': 15,
+    'evocariums': 15,
+    'augurshrines': 10,
+    'caches': 10,
+    'safes': 10,
+    'vaultsymbols': 5,
+}
+
+SDU_POINTS = [5, 10, 20, 30, 50, 80, 120, 235]
+SDU_UPGRADES = [
+    ('Ammo_Pistol', 7), ('Ammo_SMG', 7), ('Ammo_AR', 7), ('Ammo_SG', 7), ('Ammo_SR', 7),
+    ('Backpack', 8), ('Bank', 8), ('Lost_Loot', 8),
+]
+
+SPECIALIZATIONS = ['Survivor', 'Artificer', 'Enforcer', 'Slayer', 'Hunter', 'Adventurer', 'Wanderer']
+
+MAX_AMMO = {'assaultrifle': 1260, 'pistol': 900, 'shotgun': 220, 'smg': 1620, 'sniper': 190, 'repkit': 10}
+
+HOVER_DRIVE_MANUFACTURERS = ['Borg', 'Daedalus', 'Jakobs', 'Maliwan', 'Order', 'Tediore', 'Torgue', 'Vladof']
+
+# Only a few of these are in challenge_counters.csv
+ACHIEVEMENT_COUNTERS = {
+    '00_level_10': 1, '01_level_30': 1, '02_level_50': 1, '03_uvh_5': 1,
+    '04_cosmetics_collect': 60, '05_vehicles_collect': 10,
+    '06_legendaries_equip': 1, '07_challenges_gear': 1, '08_challenges_manufacturer': 1,
+    '10_worldevents_colosseum': 1, '11_worldevents_airship': 1, '12_worldevents_meteor': 1,
+    '13_contracts_complete': 80,
+    '14_discovery_grasslands': 54, '15_discovery_mountains': 62,
+    '16_discovery_shatteredlands': 47, '17_discovery_city': 21,
+    '18_worldboss_defeat': 1,
+    '19_vaultguardian_defeat': {
+        '19_vaultguardian_grasslands': 1,
+        '19_vaultguardian_mountains': 1,
+        '19_vaultguardian_shatteredlands': 1,
+    },
+    '20_missions_survivalist': 3, '21_missions_auger': 7, '22_missions_electi': 3,
+    '23_missions_claptrap': 5, '24_missions_side': 98,
+    '25_missions_grasslands': 1, '26_missions_mountains': 1, '27_missions_shatteredlands': 1,
+    '28_missions_elpis': 1, '29_missions_main': 1,
+    '30_moxxi_hidden': 1, '31_tannis_hidden': 1, '32_zane_hidden': 1, '33_oddman_hidden': 1, '34_dave_hidden': 1,
+}
+
+# Phosphene (shiny) weapon challenges, stats.shinygear.base.shiny_<name>; not in challenge_counters.csv
+PHOSPHENE_GEAR = [
+    'anarchy', 'asher', 'atlien', 'ballista', 'beegun', 'bloodstarved', 'bod', 'bonnieclyde',
+    'boomslang', 'bugbear', 'bully', 'chuck', 'coldshoulder', 'commbd', 'complex_root',
+    'convergence', 'crowdsourced', 'dividedfocus', 'dualdamage', 'finnty', 'fisheye', 'gmr',
+    'goalkeeper', 'goldengod', 'goremaster', 'heartgun', 'heavyturret', 'hellfire', 'hellwalker',
+    'kaleidosplode', 'kaoson', 'katagawa', 'kickballer', 'kingsgambit', 'leadballoon', 'linebacker',
+    'lucian', 'lumberjack', 'luty', 'noisycricket', 'ohmigot', 'om', 'onslaught', 'phantom_flame',
+    'plasmacoil', 'potatothrower', 'prince', 'queensrest', 'quickdraw', 'rainbowvomit',
+    'rangefinder', 'roach', 'rocketreload', 'rowan', 'rubysgrasp', 'seventh_sense', 'sideshow',
+    'slugger', 'star_helix', 'stopgap', 'stray', 'sweet_embrace', 'symmetry', 'tkswave', 'truck',
+    'vamoose', 'wf', 'wombocombo', 'zipgun',
+]
+
+# Staged so the specialization system unlocks after skipping the story
+EPILOGUE_MISSIONSET = {
+    'missions': {
+        'mission_main_cityepilogue': {
+            'status': 'Active',
+            'cursorposition': 8,
+            'final': {
+                'inv_openportal_endstate': 'completed',
+                'phasedimensionentered_1st': True,
+                'defeat_arjay_endstate': 'completed',
+                'take_object_endstate': 'completed',
+            },
+            'objectives': {
+                'entervault': {'status': 'Completed_PostFinished'},
+                'defeat_arjay': {'status': 'Completed_PostFinished'},
+                'entervault_todefeatarjay': {'status': 'Deactivated_PostFinished'},
+                'explore_vault': {'status': 'Completed_PostFinished'},
+                'lootchests': {'status': 'Completed_PostFinished', 'updatecount': 4},
+                'returntomoxxisbar': {'status': 'Completed_Finishing'},
+                'speaktolilith': {'status': 'Completed_PostFinished'},
+                'take_object': {'status': 'Completed_PostFinished'},
+                'inv_readyforspeaktolilith': {'status': 'Completed_PostFinished'},
+                '_lootchests_sub3': {'status': 'Completed_PostFinished'},
+                '_lootchests_sub1': {'status': 'Completed_PostFinished'},
+                '_lootchests_sub2': {'status': 'Completed_PostFinished'},
+                '_lootchests_sub0': {'status': 'Completed_PostFinished'},
+                'inv_playerarrivedatfinalplatform': {'status': 'Completed_PostFinished'},
+                'inv_openportal': {'status': 'Completed_PostFinished'},
+                'inv_interactwithrift': {'status': 'Completed_PostFinished'},
+            },
+        },
+    },
+}
+
+
+# Template data, read from the compiled data pack (see datapack.py)
+
+def missionsets():
+    return datapack.load().tree('missions')
+
+
+def collectibles():
+    return datapack.load().tree('collectibles')
+
+
+@lru_cache(maxsize=None)
+def challenge_counters():
+    """{category: {section path: {counter: value}}} from challenge_counters.csv, using each counter's highest tier."""
+    counters = {}
+    for row in datapack.load().table('challenge_counters'):
+        tiers = [int(row[f'tier{i}']) for i in range(1, 6) if row[f'tier{i}']]
+        if not tiers:
+            continue
+        *section, name = row['counter'].split('.')
+        section = tuple(section) or ('stats', 'challenge')  # bare names are challenge counters
+        counters.setdefault(row['category'], {}).setdefault(section, {})[name] = max(tiers)
+    return counters
+
+
+def level_xp(table, level):
+    rows = datapack.load().table(table).lookup(str(level))
+    if not rows:
+        raise ValueError(f"level {level} not found in {table}")
+    return int(rows[0]['points_total'])
+
+
+# Tree helpers
+
+def section(data, *keys):
+    """Return data[k1][k2]..., creating missing (or null) mappings along the way."""
+    for key in keys:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    return data
+
+
+def raise_counters(target, counters):
+    """Set counters that are missing or lower than the given values. Nested mappings are merged."""
+    for key, value in counters.items():
+        if isinstance(value, dict):
+            raise_counters(section(target, key), value)
+            continue
+        prev = target.get(key)
+        if not isinstance(prev, int) or prev < value:
+            target[key] = value
+
+
+def replace_by_name(items, key, entry):
+    """Replace the entry with the same key in a list of mappings, or append it."""
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and item.get(key) == entry[key]:
+            items[i] = entry
+            return
+    items.append(entry)
+
+
+def add_locations(data, names):
+    # Existing entries keep their state; added (or lower-state) locations are marked discovered
+    disc = section(data, 'gbx_discovery_pg')
+    disc['dlblob'] = dlcodec.add(disc.get('dlblob') or '', names)
+
+
+def merge_missionsets(data, *types):
+    local_sets = section(data, 'missions', 'local_sets')
+    prefixes = tuple(MISSION_PREFIXES[t] for t in types)
+    for name, missionset in missionsets().items():
+        if name.startswith(prefixes):
+            # Copied so saves never share (and dump as YAML aliases) template objects
+            local_sets[name] = copy.deepcopy(missionset)
+
+
+def apply_challenge_counters(data, *categories):
+    all_counters = challenge_counters()
+    for category in categories or all_counters:
+        for path, counters in all_counters.get(category, {}).items():
+            raise_counters(section(data, *path), counters)
+
+
+def _experience(data, exp_type):
+    experience = data.get('state', {}).get('experience') or []
+    return next((exp for exp in experience if isinstance(exp, dict) and exp.get('type') == exp_type), None)
+
+
+# Presets
+
+def max_ammo(data):
+    section(data, 'state')['ammo'] = dict(MAX_AMMO)
+
+
+def max_currency(data):
+    currencies = section(data, 'state', 'currencies')
+    currencies['cash'] = MAX_CURRENCY
+    currencies['eridium'] = MAX_CURRENCY
+
+
+def clear_map_fog(data):
+    disc = section(data, 'gbx_discovery_pc')
+    if not isinstance(disc.get('foddatas'), list):
+        disc['foddatas'] = []
+    for levelname in FOG_LEVELNAMES:
+        replace_by_name(disc['foddatas'], 'levelname', {
+            'levelname': levelname,
+            'foddimensionx': fogcodec.FOG_DIM,
+            'foddimensiony': fogcodec.FOG_DIM,
+            'compressiontype': 'Zlib',
+            'foddata': fogcodec.fill(),
+        })
+
+
+def visit_all_worlds(data):
+    metrics = section(data, 'gbx_discovery_pc', 'metrics')
+    for key, names in (('hasseenworldlist', WORLDS), ('hasseenregionlist', REGIONS)):
+        seen = metrics.get(key) or []
+        seen.extend(name for name in names if name not in seen)
+        metrics[key] = seen
+    metrics['hasseenregionlist'].sort(key=str.lower)
+
+
+def discover_all_locations(data):
+    add_locations(data, dlcodec.load_index())
+
+
+def discover_safehouse_locations(data):
+    index = dlcodec.load_index()
+    add_locations(data, [name for uid in SAFEHOUSE_LOCATIONS for name in index.with_prefix(SAFEHOUSE_LOCATION_PREFIX + uid)])
+
+
+def complete_all_collectibles(data):
+    found = section(data, 'stats', 'openworld', 'collectibles')
+    for category, values in collectibles().items():
+        if not isinstance(values, dict):
+            found[category] = copy.deepcopy(values)
+            continue
+        target = section(found, category)
+        for key, value in values.items():
+            if isinstance(value, dict):
+                section(target, key).update(copy.deepcopy(value))
+            else:
+                target[key] = copy.deepcopy(value)
+    section(data, 'state')['seen_eridium_logs'] = 262143
+
+
+def open_all_vault_doors(data):
+    found = section(data, 'stats', 'openworld', 'collectibles')
+    for category in ('vaultdoor', 'vaultlock'):
+        if isinstance(collectibles().get(category), dict):
+            found[category] = copy.deepcopy(collectibles()[category])
+
+
+def unlock_vault_powers(data):
+    found = section(data, 'stats', 'openworld', 'collectibles')
+    for region in ('grasslands', 'shatteredlands', 'mountains'):
+        found[f'vaultpower_{region}'] = 1
+
+
+def complete_all_achievements(data):
+    raise_counters(section(data, 'stats', 'achievements'), ACHIEVEMENT_COUNTERS)
+
+
+def complete_activity_missions(data):
+    merge_missionsets(data, 'activity')
+
+
+def complete_safehouse_missions(data):
+    merge_missionsets(data, 'safehouse', 'silo')
+
+
+def complete_all_missions(data):
+    merge_missionsets(data, 'all')
+
+
+def complete_story_missions(data):
+    merge_missionsets(data, 'story')
+
+
+def stage_epilogue_mission(data):
+    section(data, 'missions', 'local_sets')['missionset_main_cityepilogue'] = copy.deepcopy(EPILOGUE_MISSIONSET)
+
+
+def set_story_values(data):
+    section(data, 'globals')['lockdownlifted'] = True
+    section(data, 'stats', 'challenge')['mission_main_all'] = 18
+    progress = section(data, 'unlockables', 'character_progress')
+    entries = progress.get('entries') or []
+    if 'character_progress.seen_credits' not in entries:
+        entries.append('character_progress.seen_credits')
+    progress['entries'] = entries
+
+
+def set_max_sdu(data):
+    progression = section(data, 'progression')
+    if not isinstance(progression.get('graphs'), list):
+        progression['graphs'] = []
+    nodes = [
+        {'name': f'{prefix}_{i + 1:02d}', 'points_spent': SDU_POINTS[i]}
+        for prefix, levels in SDU_UPGRADES
+        for i in range(levels)
+    ]
+    replace_by_name(progression['graphs'], 'name', {
+        'name': 'sdu_upgrades',
+        'group_def_name': 'Oak2_GlobalProgressGraph_Group',
+        'nodes': nodes,
+    })
+    raise_counters(section(progression, 'point_pools'), {'echotokenprogresspoints': sum(n['points_spent'] for n in nodes)})
+
+
+def update_sdu_points(data):
+    """Recalculate SDU points from completed activities and collectibles, keeping the higher total."""
+    total = 0
+    local_sets = data.get('missions', {}).get('local_sets') or {}
+    for name in ACTIVITY_MISSIONSETS:
+        missions = (local_sets.get(name) or {}).get('missions') or {}
+        completed = sum(1 for m in missions.values() if isinstance(m, dict) and m.get('status') == 'completed')
+        total += completed * ACTIVITY_SDU_POINTS
+    found = data.get('stats', {}).get('openworld', {}).get('collectibles') or {}
+    for key, points in COLLECTIBLE_SDU_POINTS.items():
+        if key in found:
+            total += len(found[key]) * points if isinstance(found[key], dict) else points
+    raise_counters(section(data, 'progression', 'point_pools'), {'echotokenprogresspoints': total})
+
+
+def unlock_uvh_mode(data):
+    globals_ = section(data, 'globals')
+    globals_['highest_unlocked_vault_hunter_level'] = 5
+    globals_['vault_hunter_level'] = 1
+    apply_challenge_counters(data, 'ultimate vault hunter')
+
+
+def unlock_all_hover_drives(data):
+    drives = section(data, 'unlockables', 'unlockable_hoverdrives')
+    entries = drives.get('entries') if isinstance(drives.get('entries'), list) else []
+    for mfr in HOVER_DRIVE_MANUFACTURERS:
+        for i in range(1, 6):
+            # Jakobs tiers 1 and 3 are lower case in game data
+            name = mfr.lower() if mfr == 'Jakobs' and i in (1, 3) else mfr
+            entries.append(f'unlockable_hoverdrives.{name}_{i:02d}')
+    drives['entries'] = sorted(dict.fromkeys(entries), key=str.lower)
+
+
+def unlock_all_specialization(data):
+    exp = _experience(data, 'Specialization')
+    if exp is None:
+        exp = {'type': 'Specialization'}
+        experience = section(data, 'state').get('experience')
+        if not isinstance(experience, list):
+            experience = data['state']['experience'] = []
+        experience.append(exp)
+    exp['level'] = MAX_SPECIALIZATION_LEVEL
+    exp['points'] = level_xp('xp_specialization', MAX_SPECIALIZATION_LEVEL)
+
+    progression = section(data, 'progression')
+    if not isinstance(progression.get('graphs'), list):
+        progression['graphs'] = []
+    graphs = progression['graphs']
+    graph = next((g for g in graphs if isinstance(g, dict) and g.get('name') == 'ProgressGraph_Specializations'), None)
+    if graph is None:
+        graph = {'name': 'ProgressGraph_Specializations', 'group_def_name': 'progress_group', 'nodes': []}
+        graphs.append(graph)
+    # The character-specific group comes from any other graph the game has written
+    group_def = next((g['group_def_name'] for g in graphs
+                      if isinstance(g, dict) and g.get('group_def_name') and g['group_def_name'] != 'progress_group'), None)
+    graph['group_def_name'] = group_def or graph.get('group_def_name') or ''
+    graph['nodes'] = [{'name': name, 'points_spent': 100} for name in SPECIALIZATIONS]
+    section(progression, 'point_pools')['specializationtokenpool'] = 700
+
+
+def complete_all_challenges(data):
+    apply_challenge_counters(data)
+    raise_counters(section(data, 'stats', 'shinygear', 'base'), {f'shiny_{name}': 1 for name in PHOSPHENE_GEAR})
+
+
+def set_max_level(data):
+    exp = _experience(data, 'Character')
+    if exp is None:
+        return
+    exp['level'] = MAX_LEVEL
+    exp['points'] = level_xp('xp_character', MAX_LEVEL)
+    section(data, 'progression', 'point_pools')['characterprogresspoints'] = MAX_LEVEL - 1
+
+
+# name -> (function, presets it pulls in). Presets always run in this order, each at most once,
+# so follow-up steps like SDU point recalculation see the final state.
+PRESETS = {
+    'ammo': (max_ammo, ()),
+    'currency': (max_currency, ()),
+    'fog': (clear_map_fog, ('worlds',)),
+    'worlds': (visit_all_worlds, ()),
+    'locations': (discover_all_locations, ()),
+    'safehouse-locations': (discover_safehouse_locations, ()),
+    'collectibles': (complete_all_collectibles, ('sdu-points',)),
+    'vault-doors': (open_all_vault_doors, ()),
+    'vault-powers': (unlock_vault_powers, ()),
+    'achievements': (complete_all_achievements, ('activity-missions',)),
+    'activity-missions': (complete_activity_missions, ()),
+    'safehouse-missions': (complete_safehouse_missions, ('safehouse-locations', 'sdu-points')),
+    'missions': (complete_all_missions, ('epilogue', 'story-values', 'vault-doors', 'safehouse-locations', 'sdu-points')),
+    'story-missions': (complete_story_missions, ('epilogue', 'story-values')),
+    'epilogue': (stage_epilogue_mission, ()),
+    'story-values': (set_story_values, ()),
+    'sdu': (set_max_sdu, ()),
+    'uvh': (unlock_uvh_mode, ()),
+    'hover-drives': (unlock_all_hover_drives, ()),
+    'specialization': (unlock_all_specialization, ('epilogue',)),
+    'challenges': (complete_all_challenges, ()),
+    'sdu-points': (update_sdu_points, ()),
+    'max-level': (set_max_level, ()),
+}
+
+# "Apply all presets" in the web editor (character saves only)
+MAX_EVERYTHING = [
+    'ammo', 'currency', 'fog', 'locations', 'collectibles', 'achievements',
+    'safehouse-missions', 'missions', 'story-missions', 'sdu', 'vault-powers',
+    'uvh', 'hover-drives', 'specialization', 'challenges', 'max-level',
+]
+ALIASES = {'max-everything': MAX_EVERYTHING}
+
+
+def resolve(names):
+    """Expand aliases and pulled-in presets into the ordered list of presets to run."""
+    todo = [n for name in names for n in ALIASES.get(name, [name])]
+    selected = set()
+    while todo:
+        name = todo.pop()
+        if name not in PRESETS:
+            raise ValueError(f"unknown preset {name!r}")
+        if name not in selected:
+            selected.add(name)
+            todo.extend(PRESETS[name][1])
+    return [name for name in PRESETS if name in selected]
+
+
+def apply_presets(data, names):
+    """Apply presets to a parsed save in place. Returns the names that ran."""
+    order = resolve(names)
+    for name in order:
+        PRESETS[name][0](data)
+    return order
+
+
+def apply_text(text, names):
+    data = saveyaml.load(text)
+    with profiling.stage('presets'):
+        order = apply_presets(data, names)
+    with profiling.stage('yaml-dump') as st:
+        text = saveyaml.dump(data, width=2**31 - 1)
+        st.bytes_out = len(text)
+    return text, order
+
+
+def apply_file(in_path, out_path, names, user_id=None):
+    in_path, out_path = Path(in_path), Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with profiling.stage('save', in_path, bytes_in=in_path.stat().st_size):
+        if in_path.suffix == '.sav':
+            # Imported here so YAML-only runs don't need pycryptodome
+            import blcrypt
+            user_id = user_id or blcrypt.infer_user_id(in_path)
+            if not user_id:
+                raise ValueError("no user ID in path, pass -id")
+            text, order = apply_text(blcrypt.decrypt_sav_to_yaml(in_path, user_id), names)
+            corpus.write_output(out_path, blcrypt.encrypt_yaml_bytes(text.encode('utf-8'), user_id))
+        else:
+            with open(in_path, 'r', encoding='utf-8') as f:
+                text, order = apply_text(f.read(), names)
+            corpus.write_output(out_path, text)
+    return order
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the web editor's preset modifications to many saves")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("list", help="List available presets")
+
+    p_apply = sub.add_parser("apply", help="Apply presets to YAML/.sav saves")
+    p_apply.add_argument('inputs', nargs='+', help='Input YAML/.sav files or directories')
+    p_apply.add_argument('-p', '--preset', action='append', required=True, choices=[*PRESETS, *ALIASES],
+                         help='Preset to apply (repeatable). max-everything applies all character presets')
+    output = p_apply.add_mutually_exclusive_group(required=True)
+    output.add_argument('-o', '--outputdir', help='Write updated saves here, mirroring the input directories')
+    output.add_argument('--inplace', action='store_true', help='Overwrite the input saves. Back them up first!')
+    p_apply.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    p_apply.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+    profiling.add_arguments(parser)
+
+    args = parser.parse_args()
+    profiling.start(args)
+
+    if args.cmd == "list":
+        for name, (func, pulls) in PRESETS.items():
+            print(f"{name}: {func.__name__}" + (f" (+ {', '.join(pulls)})" if pulls else ""))
+        for name, names in ALIASES.items():
+            print(f"{name}: {', '.join(names)}")
+    elif args.cmd == "apply":
+        jobs = corpus.output_jobs(args.inputs, args.outputdir)
+        failures = 0
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(apply_file, in_path, out_path, args.preset, args.userid) for in_path, out_path in jobs]
+            for (in_path, out_path), fut in zip(jobs, futures):
+                try:
+                    order = fut.result()
+                    print(f"{in_path} -> {out_path}: {', '.join(order)}")
+                except Exception as e:
+                    failures += 1
+                    print(f"Warning: skipping {in_path}: {type(e).__name__}: {e}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+    else:
+        print("Please specify either list or apply", file=sys.stderr)
@@ -0,0 +1,219 @@
+# Optional per-stage instrumentation for the save tools
+# Scripts wrap expensive steps (file I/O, AES, zlib, YAML parse/dump, fog codec, merges) in
+# stage(); with --profile every stage appends one JSON line to the report with its wall time,
+# bytes in/out, peak RSS and (with --profile-memory) tracemalloc peak, tagged with the save it
+# belongs to. Worker processes find the report through BL4_PROFILE and append their own lines.
+# Without --profile, stage() returns a shared no-op object, so the hooks cost next to nothing.
+
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENV_REPORT = 'BL4_PROFILE'
+ENV_MEMORY = 'BL4_PROFILE_MEMORY'
+
+_state = {
+    'report': os.environ.get(ENV_REPORT) or None,
+    'memory': os.environ.get(ENV_MEMORY) == '1',
+    'stack': [],
+}
+
+
+def enabled():
+    return _state['report'] is not None
+
+
+def peak_rss_mb(who=None):
+    """Peak resident set size of this process (or its children) in MiB, if the platform reports it."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(who if who is not None else resource.RUSAGE_SELF)
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _write(record):
+    line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+    fd = os.open(_state['report'], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)  # one append per line, so records from concurrent workers don't interleave
+    finally:
+        os.close(fd)
+
+
+class _Null:
+    # Stand-in when profiling is off; attribute writes like st.bytes_out = n are accepted and dropped
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _Null()
+
+
+class Stage:
+    def __init__(self, name, file, bytes_in, bytes_out):
+        self.name = name
+        self.file = file
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = _state['stack']
+        if self.file is None and stack:
+            self.file = stack[-1].file
+        if _state['memory']:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Resetting the peak would hide the parent's own peak, so hand it up first
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        stack = _state['stack']
+        stack.pop()
+        record = {
+            'stage': self.name,
+            'file': str(self.file) if self.file is not None else None,
+            'pid': os.getpid(),
+            'seconds': round(seconds, 6),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'rss_peak_mb': peak_rss_mb(),
+        }
+        if _state['memory']:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            record['tracemalloc_peak_mb'] = round(peak / (1024 * 1024), 3)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        if exc_type is not None:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        _write(record)
+        return False
+
+
+def stage(name, file=None, bytes_in=None, bytes_out=None):
+    """
+    Context manager timing one stage. file defaults to the enclosing stage's file. Set
+    bytes_out (or bytes_in) on the returned object when the size is only known inside the block.
+    """
+    if _state['report'] is None:
+        return _NULL
+    return Stage(name, file, bytes_in, bytes_out)
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', metavar='REPORT', help='Write per-stage timings as JSON lines to REPORT and print a summary')
+    parser.add_argument('--profile-memory', action='store_true', help='With --profile, also record tracemalloc peaks (slower)')
+    parser.add_argument('--cprofile', metavar='FILE', help='Run under cProfile and save the stats to FILE (main process only)')
+
+
+def start(args):
+    """Enable what the --profile/--cprofile arguments ask for. Reports are finished when the script exits."""
+    if getattr(args, 'profile', None):
+        report = os.path.abspath(args.profile)
+        open(report, 'w').close()
+        _state['report'] = os.environ[ENV_REPORT] = report
+        if args.profile_memory:
+            _state['memory'] = True
+            os.environ[ENV_MEMORY] = '1'
+        atexit.register(_finish, time.perf_counter(), ' '.join(sys.argv))
+    if getattr(args, 'cprofile', None):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(_finish_cprofile, profiler, args.cprofile)
+
+
+def _finish(start_time, command):
+    _write({
+        'stage': 'total',
+        'file': None,
+        'pid': os.getpid(),
+        'seconds': round(time.perf_counter() - start_time, 6),
+        'command': command,
+        'rss_peak_mb': peak_rss_mb(),
+        'children_rss_peak_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    })
+    print(format_summary(summarize(read_report(_state['report']))), file=sys.stderr)
+    print(f"Profile report written to {_state['report']}", file=sys.stderr)
+
+
+def _finish_cprofile(profiler, path):
+    import pstats
+    profiler.disable()
+    profiler.dump_stats(path)
+    print(f"cProfile stats written to {path}; top functions by cumulative time:", file=sys.stderr)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+
+
+def read_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    """{stage: {count, seconds, bytes_in, bytes_out, rss_peak_mb, tracemalloc_peak_mb}} in first-seen order."""
+    out = {}
+    for r in records:
+        s = out.setdefault(r['stage'], {'count': 0, 'seconds': 0.0, 'bytes_in': 0, 'bytes_out': 0,
+                                        'rss_peak_mb': None, 'tracemalloc_peak_mb': None})
+        s['count'] += 1
+        s['seconds'] += r['seconds']
+        s['bytes_in'] += r.get('bytes_in') or 0
+        s['bytes_out'] += r.get('bytes_out') or 0
+        for key in ('rss_peak_mb', 'tracemalloc_peak_mb'):
+            if r.get(key) is not None:
+                s[key] = max(s[key] or 0, r[key])
+    return out
+
+
+def format_summary(summary):
+    # Stage times overlap (nested stages, parallel workers), so they don't add up to the total
+    lines = [f"{'stage':<18} {'count':>6} {'seconds':>9} {'MB in':>9} {'MB/s':>8} {'MB out':>9} {'RSS MB':>8} {'heap MB':>8}"]
+    for name, s in summary.items():
+        mb_in = s['bytes_in'] / 1e6
+        mb_s = f"{mb_in / s['seconds']:.1f}" if mb_in and s['seconds'] else '-'
+        rss = f"{s['rss_peak_mb']:.0f}" if s['rss_peak_mb'] is not None else '-'
+        heap = f"{s['tracemalloc_peak_mb']:.1f}" if s['tracemalloc_peak_mb'] is not None else '-'
+        lines.append(f"{name:<18} {s['count']:>6} {s['seconds']:>9.3f} {mb_in:>9.2f} {mb_s:>8} "
+                     f"{s['bytes_out'] / 1e6:>9.2f} {rss:>8} {heap:>8}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize a --profile report")
+    parser.add_argument('report', help='JSON-lines report written with --profile')
+    parser.add_argument('-f', '--file', action='store_true', help='Break the summary down per save file')
+    args = parser.parse_args()
+
+    records = read_report(args.report)
+    if args.file:
+        files = {}
+        for r in records:
+            files.setdefault(r.get('file'), []).append(r)
+        for file, file_records in files.items():
+            print(f"\n{file or '(no file)'}")
+            print(format_summary(summarize(file_records)))
+    else:
+        print(format_summary(summarize(records)))
@@ -0,0 +1,158 @@
+# Local result cache for decrypted and parsed saves
+# Entries are keyed by a hash of the input file contents (plus user ID / selected paths), so
+# unchanged saves skip AES, zlib and YAML parsing on reruns. Least recently used entries are
+# evicted once the cache grows past its size limit.
+#
+# Environment:
+#   BL4_CACHE=0           disable the cache
+#   BL4_CACHE_DIR=<dir>   cache location (default: ~/.cache/bl4-save-tools)
+#   BL4_CACHE_MAX_MB=<n>  size limit in MiB (default: 1024)
+#
+# The cache is best-effort: I/O errors are logged at debug level and the caller simply misses.
+
+import hashlib
+import logging
+import os
+import pickle
+import re
+import shutil
+from pathlib import Path
+
+import yaml
+
+import saveyaml
+
+# Bump when decrypt/parse output or key derivation changes so stale entries are never served
+CACHE_VERSION = 2
+TOOL_VERSION = f"{CACHE_VERSION}-pyyaml{yaml.__version__}-{'libyaml' if saveyaml.LIBYAML else 'py'}"
+
+VERSION_DIR_RE = re.compile(r'^\d+-pyyaml')
+
+log = logging.getLogger(__name__)
+
+_state = {'dir': None, 'size': None, 'broken': False}
+
+
+def enabled():
+    return os.environ.get('BL4_CACHE', '1') != '0' and not _state['broken']
+
+
+def cache_dir():
+    if _state['dir'] is None:
+        root = Path(os.environ.get('BL4_CACHE_DIR') or Path.home() / '.cache' / 'bl4-save-tools')
+        path = root / TOOL_VERSION
+        try:
+            path.mkdir(parents=True, exist_ok=True)
+            # Entries from other tool versions can never be hit again
+            for old in root.iterdir():
+                if old.is_dir() and old != path and VERSION_DIR_RE.match(old.name):
+                    shutil.rmtree(old, ignore_errors=True)
+        except OSError:
+            _state['broken'] = True  # don't retry (and re-log) for every save
+            raise
+        _state['dir'] = path
+    return _state['dir']
+
+
+def max_bytes():
+    return int(os.environ.get('BL4_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+
+def key(data, *parts):
+    h = hashlib.sha256(data)
+    for part in parts:
+        h.update(b'\0' + str(part).encode('utf-8'))
+    return h.hexdigest()
+
+
+def file_key(path, *parts):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    for part in parts:
+        h.update(b'\0' + str(part).encode('utf-8'))
+    return h.hexdigest()
+
+
+def get(key, kind):
+    """Cached bytes for (key, kind), or None. A hit marks the entry as recently used."""
+    if not enabled():
+        return None
+    try:
+        path = cache_dir() / f"{key}.{kind}"
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as err:
+        log.debug("cache read failed: %s", err)
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # evicted by another worker since the read; the data is still good
+    return data
+
+
+def put(key, kind, data):
+    if not enabled():
+        return
+    tmp = None
+    try:
+        path = cache_dir() / f"{key}.{kind}"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)  # atomic, so concurrent workers never see partial entries
+        if _state['size'] is None:
+            _state['size'] = sum(size for _, size, _ in _scan())
+        else:
+            _state['size'] += len(data)
+        if _state['size'] > max_bytes():
+            evict()
+    except OSError as err:
+        log.debug("cache write failed: %s", err)
+        if tmp is not None:
+            try:
+                tmp.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+def _scan():
+    """(path, size, mtime) for each finished entry. Other workers may rename or evict files
+    while we look, so vanished entries are skipped and in-flight .tmp files are ignored."""
+    out = []
+    for entry in os.scandir(cache_dir()):
+        if entry.name.endswith('.tmp'):
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        out.append((entry.path, st.st_size, st.st_mtime))
+    return out
+
+
+def evict():
+    """Drop least recently used entries until the cache is at 90% of its limit."""
+    entries = sorted(_scan(), key=lambda entry: entry[2])
+    size = sum(entry_size for _, entry_size, _ in entries)
+    limit = max_bytes() * 0.9
+    for path, entry_size, _ in entries:
+        if size <= limit:
+            break
+        size -= entry_size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    _state['size'] = size
+
+
+def get_tree(key):
+    data = get(key, 'pickle')
+    return pickle.loads(data) if data is not None else None
+
+
+def put_tree(key, tree):
+    put(key, 'pickle', pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
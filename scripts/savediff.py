@@ -0,0 +1,147 @@
+# Structural diff of two parsed saves
+# Each subtree is first checked with a single == (dict/list equality runs in C and stops at the
+# first difference), so the walk only descends into parts that changed and large unchanged
+# sections such as inventories cost one compare. Lists of keyed items are matched through dicts.
+# Fog maps are compared cell by cell and dlblob entries by location instead of as opaque strings.
+
+import dlcodec
+import fogcodec
+import saveyaml
+
+# Lists of mappings are matched on the first of these keys every item has
+ITEM_KEYS = ('levelname', 'name', 'type', 'missionset', 'key')
+
+MAX_VALUE_LEN = 120
+
+
+def format_path(path):
+    # List positions and keyed entries are already bracketed, e.g. foddatas[levelname=World_P]
+    out = ''
+    for part in path:
+        if isinstance(part, int):
+            out += f"[{part}]"
+        elif isinstance(part, str) and part.startswith('['):
+            out += part
+        else:
+            out += f".{part}" if out else str(part)
+    return out
+
+
+def format_value(value):
+    text = saveyaml.dump(saveyaml.untag(value), default_flow_style=True, width=2**31 - 1).strip()
+    if text.endswith('\n...'):
+        text = text[:-4]
+    return text if len(text) <= MAX_VALUE_LEN else text[:MAX_VALUE_LEN - 3] + '...'
+
+
+def _item_key(*lists):
+    for key in ITEM_KEYS:
+        for items in lists:
+            if not all(isinstance(item, dict) and key in item for item in items):
+                break
+            if len({str(item[key]) for item in items}) != len(items):
+                break
+        else:
+            return key
+    return None
+
+
+def _diff_fog(path, old, new):
+    try:
+        a, b = fogcodec.as_array(fogcodec.decode(old)), fogcodec.as_array(fogcodec.decode(new))
+    except Exception:
+        return [('~', path, old, new)]
+    if len(a) != len(b):
+        return [('~', path, f"fog {len(a)} cells", f"fog {len(b)} cells")]
+    if fogcodec.np is not None and len(a):
+        changed = int(fogcodec.np.count_nonzero(a != b))
+        before, after = fogcodec.coverage(a), fogcodec.coverage(b)
+    else:
+        # Without NumPy the maps are memoryviews; fine for the odd diff, just slower
+        changed = sum(1 for x, y in zip(a, b) if x != y)
+        before, after = sum(a) / (0xFF * len(a) or 1), sum(b) / (0xFF * len(b) or 1)
+    return [('~', path, f"fog {before:.1%} explored", f"{after:.1%} explored ({changed} cells changed)")]
+
+
+def _diff_dlblob(path, old, new):
+    try:
+        a, b = dlcodec.to_dict(old), dlcodec.to_dict(new)
+    except ValueError:
+        return [('~', path, old, new)]
+    changes = [('-', path, entry, None) for entry in a if entry not in b]
+    changes += [('~', path + (f"[{entry}]",), state, b[entry]) for entry, state in a.items()
+                if entry in b and b[entry] != state]
+    changes += [('+', path, None, entry) for entry in b if entry not in a]
+    return changes or [('~', path, 'dlblob order', 'changed')]
+
+
+def diff(old, new, path=()):
+    """List of (op, path, old, new) changes; op is '+' added, '-' removed or '~' changed."""
+    if type(old) is type(new) and old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key, value in old.items():
+            if key not in new:
+                changes.append(('-', path + (key,), value, None))
+            else:
+                changes.extend(diff(value, new[key], path + (key,)))
+        changes.extend(('+', path + (key,), None, value) for key, value in new.items() if key not in old)
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        return _diff_list(old, new, path)
+    if isinstance(old, str) and isinstance(new, str) and path:
+        if path[-1] == 'foddata':
+            return _diff_fog(path, old, new)
+        if path[-1] == 'dlblob':
+            return _diff_dlblob(path, old, new)
+    return [('~', path, old, new)]
+
+
+def _diff_list(old, new, path):
+    key = _item_key(old, new)
+    if key:
+        a = {str(item[key]): item for item in old}
+        b = {str(item[key]): item for item in new}
+        changes = []
+        for name, item in a.items():
+            sub = path + (f"[{key}={name}]",)
+            if name not in b:
+                changes.append(('-', sub, item, None))
+            else:
+                changes.extend(diff(item, b[name], sub))
+        changes.extend(('+', path + (f"[{key}={name}]",), None, item) for name, item in b.items() if name not in a)
+        return changes
+    if all(not isinstance(item, (dict, list)) for item in old + new):
+        # Scalar lists (seen lists, unlock entries) are treated as sets
+        a, b = set(map(str, old)), set(map(str, new))
+        changes = [('-', path, item, None) for item in old if str(item) not in b]
+        changes += [('+', path, None, item) for item in new if str(item) not in a]
+        return changes or [('~', path, 'order', 'changed')]
+    changes = []
+    for i in range(max(len(old), len(new))):
+        if i >= len(new):
+            changes.append(('-', path + (i,), old[i], None))
+        elif i >= len(old):
+            changes.append(('+', path + (i,), None, new[i]))
+        else:
+            changes.extend(diff(old[i], new[i], path + (i,)))
+    return changes
+
+
+def format_change(change):
+    op, path, old, new = change
+    if op == '+':
+        return f"+ {format_path(path)}: {format_value(new)}"
+    if op == '-':
+        return f"- {format_path(path)}: {format_value(old)}"
+    return f"~ {format_path(path)}: {format_value(old)} -> {format_value(new)}"
+
+
+def summarize(changes):
+    """{top-level section: {op: count}}"""
+    counts = {}
+    for op, path, _, _ in changes:
+        section = str(path[0]) if path else '(root)'
+        counts.setdefault(section, {'+': 0, '-': 0, '~': 0})[op] += 1
+    return counts
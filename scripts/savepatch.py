@@ -0,0 +1,92 @@
+# In-place patching of YAML save text
+# Records where each scalar sits in the original text (node start/end marks) and splices
+# replacement values into just those spans, so everything else stays byte-identical.
+
+import yaml
+
+import profiling
+import saveyaml
+
+
+class SavePatch:
+    def __init__(self, text):
+        self.text = text
+        with profiling.stage('yaml-compose', bytes_in=len(text)):
+            self.root = yaml.compose(text, Loader=saveyaml.SaveLoader)
+        self.patches = {}  # start index -> (end index, replacement text)
+
+    @classmethod
+    def from_file(cls, path):
+        # newline='' keeps CRLF line endings intact
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return cls(f.read())
+
+    def node(self, path, root=None):
+        """Find a node by path: a dotted string or a sequence of mapping keys/list indices."""
+        node = root or self.root
+        if isinstance(path, str):
+            path = path.split('.')
+        for key in path:
+            if isinstance(node, yaml.MappingNode):
+                node = mapping_get(node, key)
+            elif isinstance(node, yaml.SequenceNode) and isinstance(key, int):
+                node = node.value[key] if -len(node.value) <= key < len(node.value) else None
+            else:
+                node = None
+            if node is None:
+                raise KeyError(f"{key!r} not found in {'.'.join(map(str, path))}")
+        return node
+
+    def set(self, path_or_node, value):
+        """Replace a scalar's value. Custom tags on the original scalar are kept."""
+        node = path_or_node if isinstance(path_or_node, yaml.Node) else self.node(path_or_node)
+        if not isinstance(node, yaml.ScalarNode):
+            raise ValueError(f"only scalar values can be patched in place, got {node.id}")
+        if isinstance(value, str) and not isinstance(value, saveyaml.TaggedStr) and is_custom_tag(node.tag):
+            value = saveyaml.TaggedStr(value)
+            value.tag = node.tag
+        end = node.end_mark.index
+        if node.style in ('|', '>'):
+            # A block scalar's span runs through its trailing line breaks; keep those
+            while end > node.start_mark.index and self.text[end - 1] in ' \t\r\n':
+                end -= 1
+        self.patches[node.start_mark.index] = (end, format_scalar(value))
+
+    def render(self):
+        out = []
+        pos = 0
+        for start in sorted(self.patches):
+            end, replacement = self.patches[start]
+            if start < pos:
+                raise ValueError(f"overlapping patches at index {start}")
+            out.append(self.text[pos:start])
+            out.append(replacement)
+            pos = end
+        out.append(self.text[pos:])
+        return ''.join(out)
+
+    def write(self, path):
+        text = self.render()
+        with profiling.stage('write', path, bytes_out=len(text)):
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+
+
+def mapping_get(node, key):
+    for key_node, value_node in node.value:
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == key:
+            return value_node
+    return None
+
+
+def is_custom_tag(tag):
+    return tag.startswith('!') and not tag.startswith('!!')
+
+
+def format_scalar(value):
+    # Single-line flow form is valid in place of any scalar, provided the span it replaces ends at
+    # the scalar's last content character (SavePatch.set trims block scalars' trailing line breaks)
+    text = saveyaml.dump(value, default_flow_style=True, width=2**31 - 1)
+    if text.endswith('\n...\n'):
+        text = text[:-5]
+    return text.rstrip('\n')
@@ -0,0 +1,214 @@
+# Shared YAML loading/dumping for Borderlands 4 save files
+# Uses libyaml (CSafeLoader/CSafeDumper) when PyYAML was built with it, and keeps the
+# game's custom tags (e.g. `!tags`) so a load/dump round-trip doesn't drop them.
+
+import os
+
+import yaml
+
+import profiling
+
+try:
+    from yaml import CSafeLoader as _BaseLoader, CSafeDumper as _BaseDumper
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader as _BaseLoader, SafeDumper as _BaseDumper
+    LIBYAML = False
+
+
+class SaveLoader(_BaseLoader):
+    pass
+
+
+class SaveDumper(_BaseDumper):
+    pass
+
+
+# Containers that remember the custom tag they were loaded with
+class TaggedDict(dict):
+    tag = None
+
+
+class TaggedList(list):
+    tag = None
+
+
+class TaggedStr(str):
+    tag = None
+
+
+def construct_tagged(loader, tag_suffix, node):
+    if isinstance(node, yaml.SequenceNode):
+        value = TaggedList(loader.construct_sequence(node, deep=True))
+    elif isinstance(node, yaml.MappingNode):
+        value = TaggedDict(loader.construct_mapping(node, deep=True))
+    else:
+        value = TaggedStr(loader.construct_scalar(node))
+    value.tag = '!' + tag_suffix
+    return value
+
+
+def represent_tagged_dict(dumper, data):
+    return dumper.represent_mapping(data.tag, data)
+
+
+def represent_tagged_list(dumper, data):
+    return dumper.represent_sequence(data.tag, data)
+
+
+def represent_tagged_str(dumper, data):
+    return dumper.represent_scalar(data.tag, str(data))
+
+
+SaveLoader.add_multi_constructor('!', construct_tagged)
+SaveDumper.add_representer(TaggedDict, represent_tagged_dict)
+SaveDumper.add_representer(TaggedList, represent_tagged_list)
+SaveDumper.add_representer(TaggedStr, represent_tagged_str)
+
+
+def untag(obj):
+    """Recursively convert tagged containers/strings back to plain Python types."""
+    if isinstance(obj, dict):
+        return {k: untag(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [untag(x) for x in obj]
+    elif isinstance(obj, TaggedStr):
+        return str(obj)
+    return obj
+
+
+def _size(stream):
+    # Input size for profiling: bytes/str length, or the size of an open file
+    if isinstance(stream, (bytes, str)):
+        return len(stream)
+    try:
+        return os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def load(stream):
+    with profiling.stage('yaml-load', bytes_in=_size(stream)):
+        return yaml.load(stream, Loader=SaveLoader)
+
+
+def load_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return load(f)
+
+
+# Path-selective loading: walk the event stream, only compose/construct the requested
+# subtrees and stop parsing once every path has been seen.
+
+def _skip(events, event):
+    if not isinstance(event, yaml.CollectionStartEvent):
+        return
+    depth = 1
+    while depth:
+        event = next(events)
+        if isinstance(event, yaml.CollectionStartEvent):
+            depth += 1
+        elif isinstance(event, yaml.CollectionEndEvent):
+            depth -= 1
+
+
+def _compose(loader, events, event, anchors):
+    if isinstance(event, yaml.AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(None, None, f"found undefined alias {event.anchor!r} in selected subtree", event.start_mark)
+        return anchors[event.anchor]
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not isinstance(item := next(events), yaml.SequenceEndEvent):
+            node.value.append(_compose(loader, events, item, anchors))
+        node.end_mark = item.end_mark
+    else:
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not isinstance(key := next(events), yaml.MappingEndEvent):
+            key_node = _compose(loader, events, key, anchors)
+            node.value.append((key_node, _compose(loader, events, next(events), anchors)))
+        node.end_mark = key.end_mark
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+
+def _select_mapping(loader, events, prefix, wanted, prefixes, found, anchors):
+    # Returns True once every wanted path has been found
+    while not isinstance(key := next(events), yaml.MappingEndEvent):
+        value = next(events)
+        if not isinstance(key, yaml.ScalarEvent):
+            _skip(events, key)
+            _skip(events, value)
+            continue
+        path = prefix + (key.value,)
+        if path in wanted:
+            found[wanted[path]] = loader.construct_document(_compose(loader, events, value, anchors))
+            if len(found) == len(wanted):
+                return True
+        elif path in prefixes and isinstance(value, yaml.MappingStartEvent):
+            if _select_mapping(loader, events, path, wanted, prefixes, found, anchors):
+                return True
+        else:
+            _skip(events, value)
+    return False
+
+
+def select(stream, paths):
+    """
+    Load only the given dotted mapping paths (e.g. "gbx_discovery_pg.dlblob") from a YAML document.
+    Returns {path: value} for the paths that exist; other subtrees are never constructed.
+    """
+    wanted = {tuple(p.split('.')): p for p in paths}
+    prefixes = {w[:i] for w in wanted for i in range(1, len(w))}
+    found = {}
+    loader = SaveLoader('')
+    events = yaml.parse(stream, Loader=SaveLoader)
+    for event in events:
+        if isinstance(event, yaml.MappingStartEvent):
+            _select_mapping(loader, events, (), wanted, prefixes, found, {})
+            break
+        elif isinstance(event, yaml.CollectionStartEvent):
+            break
+    return found
+
+
+def select_tree(stream, paths):
+    """Like select(), but nests the results so the usual data['a']['b'] lookups work."""
+    with profiling.stage('yaml-select', bytes_in=_size(stream)):
+        found = select(stream, paths)
+    tree = {}
+    for path, value in found.items():
+        node = tree
+        *parents, leaf = path.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return tree
+
+
+def load_paths(path, paths):
+    with open(path, 'r', encoding='utf-8') as f:
+        return select_tree(f, paths)
+
+
+def dump(data, stream=None, **kwargs):
+    kwargs.setdefault('allow_unicode', True)
+    kwargs.setdefault('sort_keys', False)
+    return yaml.dump(data, stream, Dumper=SaveDumper, **kwargs)
+
+
+def dump_file(data, path, **kwargs):
+    with open(path, 'w', encoding='utf-8') as f, profiling.stage('yaml-dump', path):
+        dump(data, f, **kwargs)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# Decode/encode Borderlands 4 item serials (port of assets/serials.js)
+# Works on integers and bytes instead of '0'/'1' strings: the bitstream is a Python int,
+# bit reversal is a bytes.translate() table and pattern search uses bytes.find().
+# See docs/item_serials.md.
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+import corpus
+import profiling
+from savepatch import SavePatch, mapping_get
+
+CUSTOM_B85_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!#$%&()*+-;<=>?@^_`{|}~'
+B85_INDEX = {c: i for i, c in enumerate(CUSTOM_B85_ALPHABET)}
+
+# Reverses the bit order within each byte
+REVERSE_BITS = bytes(int(f'{b:08b}'[::-1], 2) for b in range(256))
+
+
+class Bits:
+    """Fixed-length big-endian bit sequence stored as an int. Position 0 is the first (most significant) bit."""
+    __slots__ = ('value', 'length')
+
+    def __init__(self, value, length):
+        self.value = value
+        self.length = length
+
+    @classmethod
+    def from_str(cls, bits):
+        return cls(int(bits, 2) if bits else 0, len(bits))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(int.from_bytes(data, 'big'), len(data) * 8)
+
+    def to_bytes(self):
+        # Zero-pad the end to a whole number of bytes
+        pad = -self.length % 8
+        return (self.value << pad).to_bytes((self.length + pad) // 8, 'big')
+
+    def __str__(self):
+        return format(self.value, f'0{self.length}b') if self.length else ''
+
+    def __eq__(self, other):
+        return isinstance(other, Bits) and (self.value, self.length) == (other.value, other.length)
+
+    def __add__(self, other):
+        return Bits((self.value << other.length) | other.value, self.length + other.length)
+
+    def read(self, pos, n):
+        return (self.value >> (self.length - pos - n)) & ((1 << n) - 1)
+
+    def slice(self, start, end=None):
+        end = self.length if end is None else end
+        return Bits(self.read(start, end - start), end - start)
+
+    def find(self, pattern, start=0):
+        """Index of the first occurrence of pattern at or after start, or -1."""
+        n = pattern.length
+        if n < 8:
+            for pos in range(start, self.length - n + 1):
+                if self.read(pos, n) == pattern.value:
+                    return pos
+            return -1
+        # Look for the pattern's leading whole bytes at each of the 8 bit alignments, then
+        # check the remaining bits. A leading shift of s bits puts stream bit p at p + s.
+        anchor_len = n // 8
+        anchor = (pattern.value >> (n - anchor_len * 8)).to_bytes(anchor_len, 'big')
+        best = -1
+        for shift in range(8):
+            total = (self.length + shift + 7) // 8
+            data = (self.value << (total * 8 - self.length - shift)).to_bytes(total, 'big')
+            i = data.find(anchor, (start + shift + 7) // 8)
+            while i != -1:
+                pos = i * 8 - shift
+                if best != -1 and pos >= best:
+                    break
+                if pos + n <= self.length and self.read(pos, n) == pattern.value:
+                    best = pos
+                    break
+                i = data.find(anchor, i + 1)
+        return best
+
+
+# Bit pattern used to locate the level varint in the serial bitstream
+LEVEL_PREFIX = Bits.from_str('0110000000011001000001100')
+
+# No level field (item level defaults to 1 in-game), e.g. "Matador's Match" from Gilded Glory DLC.
+# The level field is inserted 12 bits into this match, between padding and price.
+MISSING_LEVEL_PATTERN = Bits.from_str('0110000000011000100001')
+MISSING_LEVEL_OFFSET = 12
+# "100" label varint token + "100000" label 1 + "01" soft separator + "100" level varint token
+MISSING_LEVEL_HEAD = Bits.from_str('1001000001100')
+HARD_SEPARATOR = Bits.from_str('00')
+
+
+def b85_decode(serial):
+    data = serial[2:] if serial.startswith('@U') else serial
+    data = data.replace('/', '|')
+    pad_len = -len(data) % 5
+    data += CUSTOM_B85_ALPHABET[-1] * pad_len
+    out = bytearray()
+    for i in range(0, len(data), 5):
+        acc = 0
+        for c in data[i:i + 5]:
+            acc = acc * 85 + B85_INDEX[c]
+        out += (acc & 0xFFFFFFFF).to_bytes(4, 'big')
+    if pad_len:
+        del out[-pad_len:]
+    return bytes(out)
+
+
+def b85_encode(data):
+    pad_len = -len(data) % 4
+    padded = data + bytes(pad_len)
+    out = []
+    for i in range(0, len(padded), 4):
+        acc = int.from_bytes(padded[i:i + 4], 'big')
+        chars = []
+        for _ in range(5):
+            acc, rem = divmod(acc, 85)
+            chars.append(CUSTOM_B85_ALPHABET[rem])
+        out.extend(reversed(chars))
+    if pad_len:
+        del out[len(out) - (pad_len * 5) // 4:]
+    return ''.join(out)
+
+
+def serial_to_bits(serial):
+    return Bits.from_bytes(b85_decode(serial).translate(REVERSE_BITS))
+
+
+def bits_to_serial(bits):
+    return '@U' + b85_encode(bits.to_bytes().translate(REVERSE_BITS)).replace('|', '/')
+
+
+def parse_varint(bits, pos):
+    """Read a chunked varint (4 data bits, LSB first, + continuation bit). Returns (value, end)."""
+    value = 0
+    shift = 0
+    while True:
+        if pos + 5 > bits.length:
+            raise ValueError("unexpected end of serial while parsing varint")
+        chunk = bits.read(pos, 5)
+        for j in range(4):
+            value |= ((chunk >> (4 - j)) & 1) << (shift + j)
+        shift += 4
+        pos += 5
+        if not chunk & 1:
+            return value, pos
+
+
+def encode_varint(value):
+    n_chunks = max(1, (value.bit_length() + 3) // 4)
+    out = Bits(0, 0)
+    for k in range(n_chunks):
+        nibble = (value >> (4 * k)) & 0xF
+        chunk = int(f'{nibble:04b}'[::-1], 2) << 1 | (1 if k < n_chunks - 1 else 0)
+        out = out + Bits(chunk, 5)
+    return out
+
+
+def find_level(bits):
+    """(level, start, end) of the level varint, or None if the serial has no level field."""
+    idx = bits.find(LEVEL_PREFIX)
+    if idx == -1:
+        return None
+    start = idx + LEVEL_PREFIX.length
+    value, end = parse_varint(bits, start)
+    return value, start, end
+
+
+def serial_level(serial):
+    found = find_level(serial_to_bits(serial))
+    return found[0] if found else None
+
+
+def set_serial_level(serial, level):
+    """
+    Return serial with its level varint set to level, inserting the level field when it's missing.
+    Returns the original serial if it can't be updated safely.
+    """
+    bits = serial_to_bits(serial)
+    max_difference = 3
+    try:
+        found = find_level(bits)
+    except ValueError:
+        # Truncated level varint: treat like a missing level field, as serials.js does
+        found = None
+    if found:
+        _, start, end = found
+        new_bits = bits.slice(0, start) + encode_varint(level) + bits.slice(end)
+    else:
+        idx = bits.find(MISSING_LEVEL_PATTERN)
+        if idx == -1:
+            return serial
+        insert_pos = idx + MISSING_LEVEL_OFFSET
+        insert = MISSING_LEVEL_HEAD + encode_varint(level) + HARD_SEPARATOR
+        new_bits = bits.slice(0, insert_pos) + insert + bits.slice(insert_pos)
+        max_difference += 4
+    new_serial = bits_to_serial(new_bits)
+    if abs(len(new_serial) - len(serial)) > max_difference:
+        return serial
+    return new_serial
+
+
+@lru_cache(maxsize=None)
+def relevel_serial(serial, level):
+    """Memoized set_serial_level(): the same serials recur across characters and saves."""
+    try:
+        return set_serial_level(serial, level)
+    except KeyError:
+        # Not a valid Base85 serial
+        return serial
+
+
+def _slot_items(slot):
+    if isinstance(slot, list):
+        return [item for item in slot if isinstance(item, dict) and item.get('serial')]
+    if isinstance(slot, dict) and slot.get('serial'):
+        return [slot]
+    return []
+
+
+def _get(data, path):
+    for key in path.split('.'):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+# Where item slots live: character backpack/equipped, and the shared bank in profile.sav
+BANK_PATH = 'domains.local.shared.inventory.items.bank'
+INVENTORY_PATHS = [
+    'state.inventory.items.backpack',
+    'state.inventory.equipped_inventory.equipped',
+    BANK_PATH,
+]
+MAX_LEVEL = 50
+AUDIT_PATHS = INVENTORY_PATHS + ['state.experience']
+
+
+def iter_items(data):
+    """Yield (section path, slot key, item dict) for every item with a serial."""
+    for path in INVENTORY_PATHS:
+        slots = _get(data, path)
+        if not isinstance(slots, dict):
+            continue
+        for slot_key, slot in slots.items():
+            for item in _slot_items(slot):
+                yield path, slot_key, item
+
+
+def character_level(data):
+    for exp in _get(data, 'state.experience') or []:
+        if isinstance(exp, dict) and exp.get('type') == 'Character':
+            return exp.get('level')
+    return None
+
+
+def decode_items(data):
+    """Decode every serial in a save's inventory and bank: [(section, slot, level or None)]."""
+    levels = {}
+    out = []
+    for path, slot_key, item in iter_items(data):
+        serial = item['serial']
+        if serial not in levels:
+            try:
+                levels[serial] = serial_level(serial)
+            except (KeyError, ValueError):
+                levels[serial] = None
+        out.append((path, slot_key, levels[serial]))
+    return out
+
+
+def audit_save(data):
+    return character_level(data), decode_items(data)
+
+
+def _serial_nodes(slot):
+    # Same shapes as _slot_items(), on composed YAML nodes
+    items = slot.value if isinstance(slot, yaml.SequenceNode) else [slot]
+    for item in items:
+        if isinstance(item, yaml.MappingNode):
+            node = mapping_get(item, 'serial')
+            if isinstance(node, yaml.ScalarNode) and node.value:
+                yield node
+
+
+def relevel_text(text, level=None):
+    """
+    Rewrite every item serial in a save's YAML text to level, patching only the serial values.
+    Without a level, backpack/equipped items get the character level and bank items MAX_LEVEL,
+    like the web editor. Returns (new text, serials changed, serials seen).
+    """
+    patch = SavePatch(text)
+    char_level = None
+    try:
+        for exp in patch.node('state.experience').value:
+            if isinstance(exp, yaml.MappingNode) and getattr(mapping_get(exp, 'type'), 'value', None) == 'Character':
+                char_level = int(mapping_get(exp, 'level').value)
+    except (KeyError, AttributeError, ValueError):
+        pass
+    changed = seen = 0
+    with profiling.stage('relevel'):
+        for path in INVENTORY_PATHS:
+            target = level if level is not None else (MAX_LEVEL if path == BANK_PATH else char_level)
+            try:
+                slots = patch.node(path)
+            except KeyError:
+                continue
+            if target is None or not isinstance(slots, yaml.MappingNode):
+                continue
+            for _, slot in slots.value:
+                for node in _serial_nodes(slot):
+                    seen += 1
+                    new_serial = relevel_serial(node.value, target)
+                    if new_serial != node.value:
+                        patch.set(node, new_serial)
+                        changed += 1
+    return patch.render(), changed, seen
+
+
+def relevel_file(in_path, out_path, level=None, user_id=None):
+    in_path, out_path = Path(in_path), Path(out_path)
+    with profiling.stage('save', in_path, bytes_in=in_path.stat().st_size):
+        if in_path.suffix == '.sav':
+            # Imported here so YAML-only runs don't need pycryptodome
+            import blcrypt
+            user_id = user_id or blcrypt.infer_user_id(in_path)
+            if not user_id:
+                raise ValueError("no user ID in path, pass -id")
+            text = blcrypt.decrypt_sav_to_yaml(in_path, user_id).decode('utf-8')
+            new_text, changed, seen = relevel_text(text, level)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            if changed or in_path != out_path:
+                corpus.write_output(out_path, blcrypt.encrypt_yaml_bytes(new_text.encode('utf-8'), user_id))
+        else:
+            with open(in_path, 'r', encoding='utf-8', newline='') as f:
+                new_text, changed, seen = relevel_text(f.read(), level)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            corpus.write_output(out_path, new_text, newline='')
+    return changed, seen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode item serials, audit and rewrite item levels in save files")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_decode = sub.add_parser("decode", help="Print the level of one or more serials")
+    p_decode.add_argument('serials', nargs='+', help='Item serials (@U...)')
+
+    p_audit = sub.add_parser("audit", help="Report item levels for every item in many saves")
+    p_audit.add_argument('inputs', nargs='+', help='Input YAML/.sav files or directories')
+    p_audit.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    p_audit.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+
+    p_relevel = sub.add_parser("relevel", help="Set every item serial in saves to a level, inserting missing level fields")
+    p_relevel.add_argument('inputs', nargs='+', help='Input YAML/.sav files or directories')
+    p_relevel.add_argument('-l', '--level', type=int, help=f'Item level (default: character level for character items, {MAX_LEVEL} for bank items)')
+    output = p_relevel.add_mutually_exclusive_group(required=True)
+    output.add_argument('-o', '--outputdir', help='Write updated saves here, mirroring the input directories')
+    output.add_argument('--inplace', action='store_true', help='Overwrite the input saves. Back them up first!')
+    p_relevel.add_argument('-id', '--userid', help='Steam/Epic ID for .sav inputs (default: inferred from the save path)')
+    p_relevel.add_argument('-j', '--jobs', type=int, help='Worker processes (default: CPU count)')
+    profiling.add_arguments(parser)
+
+    args = parser.parse_args()
+    profiling.start(args)
+
+    if args.cmd == "decode":
+        for serial in args.serials:
+            print(f"{serial}: level {serial_level(serial)}")
+    elif args.cmd == "audit":
+        for save_path, (char_level, items) in corpus.map_saves(audit_save, args.inputs, AUDIT_PATHS, args.userid, args.jobs):
+            levels = [level for _, _, level in items if level is not None]
+            missing = sum(1 for _, _, level in items if level is None)
+            below = sum(1 for level in levels if char_level and level < char_level)
+            level_range = f"{min(levels)}-{max(levels)}" if levels else "-"
+            print(f"{save_path}: {len(items)} items, levels {level_range}, {missing} without level, {below} below character level {char_level}")
+    elif args.cmd == "relevel":
+        jobs = corpus.output_jobs(args.inputs, args.outputdir)
+        failures = 0
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(relevel_file, in_path, out_path, args.level, args.userid) for in_path, out_path in jobs]
+            for (in_path, out_path), fut in zip(jobs, futures):
+                try:
+                    changed, seen = fut.result()
+                    print(f"{in_path} -> {out_path}: {changed}/{seen} serials updated")
+                except Exception as e:
+                    failures += 1
+                    print(f"Warning: skipping {in_path}: {type(e).__name__}: {e}", file=sys.stderr)
+        if failures:
+            sys.exit(1)
+    else:
+        print("Please specify either decode, audit or relevel", file=sys.stderr)
@@ -0,0 +1,18 @@
+import re
+from pathlib import Path
+
+import presets
+
+CHALLENGES_JS = Path(__file__).resolve().parent.parent / 'assets' / 'challenges.js'
+
+
+def test_max_everything_sets_phosphene_counters():
+    data = {'state': {'experience': [{'type': 'Character', 'level': 1, 'points': 0}]},
+            'stats': {'shinygear': {'base': {'shiny_zipgun': 3}}}}
+    presets.apply_presets(data, ['max-everything'])
+    shiny = data['stats']['shinygear']['base']
+    # Every counter the web tool's completePhospheneChallenges sets
+    expected = set(re.findall(r'\b(shiny_\w+): 1', CHALLENGES_JS.read_text(encoding='utf-8')))
+    assert len(expected) > 60
+    assert {name for name, value in shiny.items() if value >= 1} == expected
+    assert shiny['shiny_zipgun'] == 3
@@ -0,0 +1,47 @@
+import pytest
+
+import blcrypt
+import corpus
+import savecache
+
+USER_ID = '76561190000000001'
+YAML = b"state:\n  char_name: test\n  experience:\n  - type: Character\n    level: 3\n"
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(savecache, '_state', {'dir': None, 'size': None, 'broken': False})
+    monkeypatch.delenv('BL4_CACHE', raising=False)
+
+
+@pytest.fixture
+def sav(tmp_path):
+    path = tmp_path / USER_ID / '1.sav'
+    path.parent.mkdir()
+    path.write_bytes(blcrypt.encrypt_yaml_bytes(YAML, USER_ID))
+    return path
+
+
+def test_cache_dir_is_a_file(fresh_cache, monkeypatch, tmp_path, sav):
+    not_a_dir = tmp_path / 'cache'
+    not_a_dir.write_text('')
+    monkeypatch.setenv('BL4_CACHE_DIR', str(not_a_dir))
+    assert blcrypt.decrypt_sav_to_yaml(sav, USER_ID) == YAML
+    assert not savecache.enabled()
+    assert corpus.load_save(sav)['state']['char_name'] == 'test'
+
+
+def test_round_trip(fresh_cache, monkeypatch, tmp_path, sav):
+    monkeypatch.setenv('BL4_CACHE_DIR', str(tmp_path / 'cache'))
+    assert blcrypt.decrypt_sav_to_yaml(sav, USER_ID) == YAML
+    key = savecache.key(sav.read_bytes(), USER_ID)
+    assert savecache.get(key, 'yaml') == YAML
+    savecache.put_tree('tree', {'a': 1})
+    assert savecache.get_tree('tree') == {'a': 1}
+
+
+def test_get_after_eviction(fresh_cache, monkeypatch, tmp_path):
+    monkeypatch.setenv('BL4_CACHE_DIR', str(tmp_path / 'cache'))
+    savecache.put('k', 'yaml', b'data')
+    (savecache.cache_dir() / 'k.yaml').unlink()
+    assert savecache.get('k', 'yaml') is None
@@ -0,0 +1,28 @@
+import pytest
+import yaml
+
+from savepatch import SavePatch
+
+
+@pytest.mark.parametrize('indicator', ['|', '|-', '>-', '|+'])
+def test_set_block_scalar(indicator):
+    text = f"a: 1\nb: {indicator}\n  old\n  text\n\nc: 1\n"
+    patch = SavePatch(text)
+    patch.set('b', 'NEW')
+    out = patch.render()
+    assert out == "a: 1\nb: NEW\n\nc: 1\n"
+    assert yaml.safe_load(out) == {'a': 1, 'b': 'NEW', 'c': 1}
+
+
+def test_set_block_scalar_in_sequence():
+    text = "items:\n- |\n  one\n- two\n"
+    patch = SavePatch(text)
+    patch.set(['items', 0], 'x\ny')
+    assert yaml.safe_load(patch.render()) == {'items': ['x\ny', 'two']}
+
+
+def test_set_keeps_rest_of_text():
+    text = "a: 1  # comment\r\nb: 'q'\r\n"
+    patch = SavePatch(text)
+    patch.set('a', 2)
+    assert patch.render() == "a: 2  # comment\r\nb: 'q'\r\n"